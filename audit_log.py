@@ -0,0 +1,236 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+import warnings
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+import metrics
+from disease_config import BASE_DIR
+
+load_dotenv()
+DEFAULT_SPILL_PATH = os.path.join(BASE_DIR, ".cache", "audit_spill.jsonl")
+
+
+def _default_collection():
+    # Imported on the writer thread: pages never load the MongoDB driver just to audit
+    from database import get_audit_collection
+    return get_audit_collection()
+
+
+def _already_written(error):
+    # A retried insert_many whose only errors are duplicate _ids: those records made it the first time
+    details = getattr(error, "details", None) or {}
+    write_errors = details.get("writeErrors")
+    return bool(write_errors) and not details.get("writeConcernErrors") and all(
+        e.get("code") == 11000 for e in write_errors
+    )
+
+
+def prediction_record(doctor_id, doctor_email, disease, inputs, prediction, risk_percent, source="predictor",
+                      **patient):
+    return {
+        "created_at": datetime.now(timezone.utc),
+        "source": source,
+        "doctor_id": doctor_id,
+        "doctor_email": doctor_email,
+        "disease": disease,
+        "inputs": dict(inputs),
+        "prediction": prediction,
+        "risk_percent": risk_percent,
+        **patient,
+    }
+
+
+def screening_record(doctor_id, doctor_email, disease, file_name, summary):
+    # One summary record per screened file, next to a prediction_record for every scored row
+    return {
+        "created_at": datetime.now(timezone.utc),
+        "source": "batch_screening",
+        "doctor_id": doctor_id,
+        "doctor_email": doctor_email,
+        "disease": disease,
+        "file_name": file_name,
+        **summary,
+    }
+
+
+class AuditWriter:
+    """Writes audit records to MongoDB in batches, off the request path.
+
+    ``record`` only puts the record on a bounded in-memory queue. A background
+    thread drains it with ``insert_many``, retrying failed batches with backoff.
+    Records that cannot be queued (queue full) or written (database down after
+    the retries, or at shutdown) are appended to a local JSONL spill file, which
+    is replayed into MongoDB the next time the writer starts, so none are lost.
+    """
+
+    def __init__(self, collection_factory=_default_collection, max_queue=10000, batch_size=500,
+                 flush_interval=1.0, max_retries=3, spill_path=DEFAULT_SPILL_PATH):
+        self.collection_factory = collection_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.spill_path = spill_path
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._collection = None
+        self._spill_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.stats = {"queued": 0, "written": 0, "spilled": 0, "failed_batches": 0}
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, record):
+        """Queue one record; never blocks. Returns False if it had to be spilled to disk instead."""
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._spill([record])
+            return False
+        self._count("queued", 1)
+        return True
+
+    def record_many(self, records, timeout=30.0):
+        """Queue a batch of records (e.g. one screened chunk), waiting up to ``timeout`` seconds for room.
+
+        For callers off the latency-critical path: a large batch waits for the
+        writer to drain the queue instead of overflowing it. Whatever still does
+        not fit when the time is up is spilled to disk.
+        """
+        deadline = time.monotonic() + timeout
+        for i, record in enumerate(records):
+            try:
+                self._queue.put(record, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                self._count("queued", i)
+                self._spill(records[i:])
+                return False
+        self._count("queued", len(records))
+        return True
+
+    def _count(self, name, n):
+        with self._stats_lock:
+            self.stats[name] += n
+
+    def close(self, timeout=10.0):
+        """Flush what is queued and stop the writer thread (also registered with atexit)."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        # Whatever the thread could not write in time goes to the spill file
+        leftover = []
+        while True:
+            try:
+                leftover.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if leftover:
+            self._spill(leftover)
+
+    def _run(self):
+        self._replay_spill()
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _insert(self, records):
+        if self._collection is None:
+            self._collection = self.collection_factory()
+        with metrics.span("audit.insert_many"):
+            self._collection.insert_many(records, ordered=False)
+
+    def _write(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._insert(batch)
+            except Exception as e:
+                if _already_written(e):
+                    self._count("written", len(batch))
+                    return True
+                self._count("failed_batches", 1)
+                error = e
+                if self._stop.is_set():
+                    break
+                time.sleep(min(30.0, 0.5 * 2 ** attempt))
+            else:
+                self._count("written", len(batch))
+                return True
+        warnings.warn(f"Audit log: spilling {len(batch)} records after insert failure: {error}")
+        self._spill(batch)
+        return False
+
+    def _spill(self, records):
+        lines = []
+        for record in records:
+            record = {k: v for k, v in record.items() if k != "_id"}
+            record["created_at"] = record["created_at"].isoformat()
+            lines.append(json.dumps(record) + "\n")
+        with self._spill_lock:
+            os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+        self._count("spilled", len(records))
+
+    def _replay_spill(self):
+        replay_path = self.spill_path + ".replay"
+        with self._spill_lock:
+            if os.path.exists(self.spill_path):
+                if os.path.exists(replay_path):
+                    # Left over from a replay that was interrupted: replay both
+                    with open(self.spill_path, encoding="utf-8") as src:
+                        with open(replay_path, "a", encoding="utf-8") as dst:
+                            dst.write(src.read())
+                    os.remove(self.spill_path)
+                else:
+                    os.replace(self.spill_path, replay_path)
+        if not os.path.exists(replay_path):
+            return
+        with open(replay_path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        for record in records:
+            record["created_at"] = datetime.fromisoformat(record["created_at"])
+        for start in range(0, len(records), self.batch_size):
+            # Failures here are spilled again by _write and retried on the next start
+            self._write(records[start:start + self.batch_size])
+        os.remove(replay_path)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_writer():
+    """The process-wide writer, or None when auditing is off (AUDIT_LOG_ENABLED=0 or no MONGO_URI)."""
+    global _writer
+    if os.getenv("AUDIT_LOG_ENABLED", "1") == "0" or not os.getenv("MONGO_URI"):
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AuditWriter(
+                    max_queue=int(os.getenv("AUDIT_QUEUE_SIZE", "10000")),
+                    batch_size=int(os.getenv("AUDIT_BATCH_SIZE", "500")),
+                    flush_interval=float(os.getenv("AUDIT_FLUSH_INTERVAL_SECONDS", "1")),
+                    spill_path=os.getenv("AUDIT_SPILL_PATH", DEFAULT_SPILL_PATH),
+                )
+    return _writer
@@ -1,42 +1,325 @@
-import pymongo
-import os
-from dotenv import load_dotenv
+import base64
+import collections
 import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+# Settings (override through environment variables / .env)
+SESSION_TTL_SECONDS = int(os.getenv("AUTH_SESSION_TTL_SECONDS", "28800"))
+REPORT_LINK_TTL_SECONDS = int(os.getenv("AUTH_REPORT_LINK_TTL_SECONDS", "900"))
+MAX_FAILED_LOGINS = int(os.getenv("AUTH_MAX_FAILED_LOGINS", "5"))
+LOCKOUT_WINDOW_SECONDS = int(os.getenv("AUTH_LOCKOUT_WINDOW_SECONDS", "300"))
+MAX_TRACKED_ACCOUNTS = int(os.getenv("AUTH_MAX_TRACKED_ACCOUNTS", "100000"))
+HASH_TIMEOUT_SECONDS = 10
+SERVER_BUSY_MESSAGE = "The server is busy right now. Please try again in a moment."
+
+# Tokens signed with a per-process key stop validating after a restart,
+# which matches Streamlit dropping session state on restart anyway.
+_SHARED_SECRET = bool(os.getenv("AUTH_SECRET_KEY"))
+_SECRET_KEY = os.getenv("AUTH_SECRET_KEY", "").encode() or secrets.token_bytes(32)
+
+# Password hashing (werkzeug's default scrypt, or PBKDF2 for older hashes) runs in OpenSSL
+# without holding the GIL, so a small pool keeps a login burst from stalling the script
+# threads of other sessions.
+_hash_workers = int(os.getenv("AUTH_HASH_WORKERS", "4"))
+_hash_executor = ThreadPoolExecutor(
+    max_workers=_hash_workers,
+    thread_name_prefix="auth-hash"
+)
+# Hashes running or waiting; beyond this a login is told the server is busy instead of queueing
+_hash_slots = threading.BoundedSemaphore(_hash_workers + int(os.getenv("AUTH_HASH_QUEUE", "16")))
 
-# Load .env variables
-load_dotenv()
-MONGO_URI = os.getenv("MONGO_URI")
+_LEGACY_SHA256 = re.compile(r"[0-9a-f]{64}")
 
-client = pymongo.MongoClient(MONGO_URI)
-db = client["multi_disease_app"]
-users_collection = db["users"]
 
-# Password hashing
+class TooManyAttempts(Exception):
+    pass
+
+
+# Password hashing (werkzeug is imported on first use; every page validates
+# sessions through this module but only the login page hashes)
+def _hash(password):
+    from werkzeug.security import generate_password_hash
+    return generate_password_hash(password)
+
+def _run_hash(fn, *args):
+    """Run ``fn`` on the hash executor; raises TimeoutError when it is saturated or too slow."""
+    if not _hash_slots.acquire(blocking=False):
+        raise TimeoutError("Too many password hashes pending")
+    future = _hash_executor.submit(fn, *args)
+    future.add_done_callback(lambda _: _hash_slots.release())
+    try:
+        return future.result(HASH_TIMEOUT_SECONDS)
+    except TimeoutError:
+        # Nobody waits for the answer any more: don't let it hold a worker later on
+        future.cancel()
+        raise
+
 def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+    with metrics.span("auth.hash_password"):
+        return _run_hash(_hash, password)
+
+def _verify(password, hashed):
+    if _LEGACY_SHA256.fullmatch(hashed):
+        # Accounts created by the old unsalted SHA-256 signup
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), hashed)
+    from werkzeug.security import check_password_hash
+    return check_password_hash(hashed, password)
 
 def verify_password(password, hashed):
-    return hash_password(password) == hashed
+    with metrics.span("auth.verify_password"):
+        return _run_hash(_verify, password, hashed)
+
+def needs_rehash(hashed):
+    return bool(_LEGACY_SHA256.fullmatch(hashed))
+
+
+# Per-account rate limiting of failed logins
+class LoginRateLimiter:
+    def __init__(self, max_failures=MAX_FAILED_LOGINS, window=LOCKOUT_WINDOW_SECONDS,
+                 max_accounts=MAX_TRACKED_ACCOUNTS):
+        self.max_failures = max_failures
+        self.window = window
+        self.max_accounts = max_accounts
+        # Ordered by latest failure, so accounts whose failures have aged out come first
+        self._failures = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _recent(self, key, now):
+        failures = self._failures.setdefault(key, collections.deque())
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        return failures
+
+    def check(self, key):
+        now = time.monotonic()
+        with self._lock:
+            failures = self._recent(key, now)
+            if len(failures) >= self.max_failures:
+                retry_after = int(failures[0] + self.window - now) + 1
+                raise TooManyAttempts(f"Too many failed attempts. Try again in {retry_after} seconds.")
+            if not failures:
+                del self._failures[key]
+
+    def record_failure(self, key):
+        now = time.monotonic()
+        with self._lock:
+            self._recent(key, now).append(now)
+            self._failures.move_to_end(key)
+            # Failed logins for ever new (e.g. random) emails must not grow the table without bound
+            while self._failures:
+                oldest = next(iter(self._failures.values()))
+                if oldest[-1] > now - self.window and len(self._failures) <= self.max_accounts:
+                    break
+                self._failures.popitem(last=False)
+
+    def reset(self, key):
+        with self._lock:
+            self._failures.pop(key, None)
+
+
+login_limiter = LoginRateLimiter()
+
+
+# Signed session tokens, cached until they expire
+class TokenCache:
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()
+        self._revoked = {}  # token -> exp; a revoked token stays refused until it would have expired
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        with self._lock:
+            payload = self._entries.get(token)
+            if payload is None:
+                return None
+            if payload["exp"] <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return payload
+
+    def put(self, token, payload):
+        with self._lock:
+            if token in self._revoked:
+                return
+            self._entries[token] = payload
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def revoke(self, token, exp):
+        now = time.time()
+        with self._lock:
+            self._entries.pop(token, None)
+            for expired in [t for t, t_exp in self._revoked.items() if t_exp <= now]:
+                del self._revoked[expired]
+            self._revoked[token] = exp
+
+    def is_revoked(self, token):
+        with self._lock:
+            return token in self._revoked
+
+
+_token_cache = TokenCache()
+
+def _sign(body):
+    return hmac.new(_SECRET_KEY, body.encode(), hashlib.sha256).hexdigest()
+
+def issue_session_token(email, doctor_id, ttl=SESSION_TTL_SECONDS):
+    payload = {"email": email, "doctor_id": doctor_id, "exp": int(time.time()) + ttl}
+    body = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+    token = f"{body}.{_sign(body)}"
+    _token_cache.put(token, payload)
+    return token
+
+def validate_session_token(token):
+    """Return the token payload if it is authentic and unexpired; never touches MongoDB."""
+    if not token:
+        return None
+    payload = _token_cache.get(token)
+    if payload is not None:
+        return payload
+    if _token_cache.is_revoked(token):
+        return None
+    body, _, signature = token.partition(".")
+    if not hmac.compare_digest(_sign(body), signature):
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(body.encode()))
+    except ValueError:
+        return None
+    if payload.get("exp", 0) <= time.time():
+        return None
+    _token_cache.put(token, payload)
+    return payload
+
+def revoke_session_token(token):
+    """Refuse ``token`` from now on (in this process) until it expires."""
+    payload = validate_session_token(token)
+    if payload is not None:
+        _token_cache.revoke(token, payload["exp"])
+
+def session_is_valid(session_state):
+    # Called on every page load instead of re-checking credentials
+    if not session_state.get("authenticated"):
+        return False
+    payload = validate_session_token(session_state.get("auth_token"))
+    if payload is None or payload["email"] != session_state.get("email"):
+        session_state["authenticated"] = False
+        return False
+    return True
+
+def end_session(session_state):
+    revoke_session_token(session_state.get("auth_token"))
+    session_state["authenticated"] = False
+    session_state["email"] = None
+    session_state["doctor_id"] = None
+    session_state["auth_token"] = None
+
+
+# Signed report download links; set AUTH_SECRET_KEY to the same value on every
+# replica and on prediction_service.py so any of them can verify a link
+def has_shared_secret():
+    """True when AUTH_SECRET_KEY is set: without it, no other process can verify what this one signs."""
+    return _SHARED_SECRET
+
+def issue_report_link(report_id, ttl=REPORT_LINK_TTL_SECONDS):
+    body = f"{report_id}.{int(time.time()) + ttl}"
+    return f"{body}.{_sign(body)}"
+
+def verify_report_link(token):
+    """Return the report id of an authentic, unexpired link token, else None."""
+    body, _, signature = (token or "").rpartition(".")
+    report_id, _, expires = body.partition(".")
+    if not body or not hmac.compare_digest(_sign(body), signature):
+        return None
+    if not expires.isdigit() or int(expires) <= time.time():
+        return None
+    return report_id
+
 
 # Signup logic
-def register_user(name, email, doctor_id, password):
-    if users_collection.find_one({"email": email}):
-        return False, "Email already registered"
-    
-    hashed_pw = hash_password(password)
-    users_collection.insert_one({
-        "name": name,
+_DUPLICATE_MESSAGES = {
+    "email": "Email already registered.",
+    "doctor_id": "Doctor ID already in use.",
+    "organization_id": "Organization ID already in use.",
+}
+
+def register_user(email, password, doctor_id, org_id=None, name=None):
+    # Imported here so pages that only validate tokens don't load the MongoDB driver
+    from pymongo.errors import DuplicateKeyError
+    from database import duplicate_key_field, get_users_collection, indexes_missing
+
+    users = get_users_collection()
+    if indexes_missing("users"):
+        # No unique indexes (e.g. existing duplicates blocked them): check first, as signup used to
+        for field, value in (("email", email), ("doctor_id", doctor_id), ("organization_id", org_id)):
+            if value is not None:
+                with metrics.span("mongo.find_user"):
+                    if users.find_one({field: value}, {"_id": 1}) is not None:
+                        return False, _DUPLICATE_MESSAGES[field]
+
+    try:
+        password_hash = hash_password(password)
+    except TimeoutError:
+        # Hash queue backed up (login burst): ask the user to retry rather than fail the page
+        return False, SERVER_BUSY_MESSAGE
+    user = {
         "email": email,
-        "doctor_id": doctor_id,
-        "password": hashed_pw
-    })
-    return True, "Signup successful"
+        "password": password_hash,
+        "doctor_id": doctor_id
+    }
+    if org_id is not None:
+        user["organization_id"] = org_id
+    if name is not None:
+        user["name"] = name
+    try:
+        with metrics.span("mongo.insert_user"):
+            users.insert_one(user)
+    except DuplicateKeyError as e:
+        return False, _DUPLICATE_MESSAGES.get(duplicate_key_field(e), _DUPLICATE_MESSAGES["email"])
+    return True, "Signup successful! Please login."
 
 # Login logic
 def login_user(email, password):
-    user = users_collection.find_one({"email": email})
-    if not user:
-        return False, "User not found"
-    if not verify_password(password, user["password"]):
-        return False, "Incorrect password"
-    return True, user
+    """Check credentials and return ``(True, session_token)`` or ``(False, message)``."""
+    from database import get_users_collection
+
+    try:
+        login_limiter.check(email)
+    except TooManyAttempts as e:
+        return False, str(e)
+
+    users = get_users_collection()
+    with metrics.span("mongo.find_user"):
+        user = users.find_one({"email": email}, {"password": 1, "doctor_id": 1})
+    try:
+        valid = bool(user) and verify_password(password, user["password"])
+    except TimeoutError:
+        # Not a failed attempt: the hash queue is backed up (login burst)
+        return False, SERVER_BUSY_MESSAGE
+    if not valid:
+        login_limiter.record_failure(email)
+        return False, "Invalid email or password"
+
+    login_limiter.reset(email)
+    if needs_rehash(user["password"]):
+        # Upgrade legacy SHA-256 hashes to werkzeug's salted default (scrypt) on successful login; retried next time if busy
+        try:
+            new_hash = hash_password(password)
+        except TimeoutError:
+            new_hash = None
+        if new_hash is not None:
+            with metrics.span("mongo.update_password"):
+                users.update_one({"_id": user["_id"]}, {"$set": {"password": new_hash}})
+    return True, issue_session_token(email, user.get("doctor_id", ""))
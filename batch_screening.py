@@ -0,0 +1,102 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from disease_config import disease_inputs
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+class ScreeningError(Exception):
+    pass
+
+
+def missing_columns(columns, disease):
+    present = set(columns)
+    return [field for field in disease_inputs[disease] if field not in present]
+
+
+def _unreadable(file_name, error):
+    """A ScreeningError the page can show for an upload pandas or pyarrow could not read."""
+    if isinstance(error, UnicodeDecodeError):
+        return ScreeningError(f"{file_name} is not UTF-8 text. Please save it as a UTF-8 CSV and upload it again.")
+    kind = "Parquet" if file_name.lower().endswith(".parquet") else "CSV"
+    return ScreeningError(f"{file_name} could not be read as a {kind} file: {error}")
+
+
+def read_columns(file, file_name):
+    # Only the header is read here, so validation is cheap even for large files
+    if file_name.lower().endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        try:
+            columns = pq.ParquetFile(file).schema_arrow.names
+        except pa.ArrowException as e:
+            raise _unreadable(file_name, e) from None
+    else:
+        try:
+            columns = list(pd.read_csv(file, nrows=0).columns)
+        except (UnicodeDecodeError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+            raise _unreadable(file_name, e) from None
+    file.seek(0)
+    return columns
+
+
+def iter_chunks(file, file_name, chunk_size=DEFAULT_CHUNK_SIZE):
+    if file_name.lower().endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        try:
+            for batch in pq.ParquetFile(file).iter_batches(batch_size=chunk_size):
+                yield batch.to_pandas()
+        except pa.ArrowException as e:
+            raise _unreadable(file_name, e) from None
+    else:
+        try:
+            yield from pd.read_csv(file, chunksize=chunk_size)
+        except (UnicodeDecodeError, pd.errors.ParserError) as e:
+            # Bad bytes or a malformed line can come up in any chunk, not only the header
+            raise _unreadable(file_name, e) from None
+
+
+def scored_rows(disease, result, first_row=0):
+    """Yield ``(row number, inputs, label, risk %)`` for the valid rows of a ``score_chunk`` result."""
+    fields = disease_inputs[disease]
+    valid = (result["Prediction"] != "Invalid input").to_numpy()
+    features = result[fields].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)[valid]
+    labels = (result["Prediction"].to_numpy()[valid] == "Positive (At Risk)").astype(int)
+    risks = result["Risk (%)"].to_numpy()[valid]
+    for row, values, label, risk in zip(np.flatnonzero(valid) + first_row, features.tolist(), labels.tolist(),
+                                        risks.tolist()):
+        yield int(row), dict(zip(fields, values)), label, risk
+
+
+def screen_file(registry, disease, file, file_name, chunk_size=DEFAULT_CHUNK_SIZE, output=None, on_chunk=None):
+    """Score an uploaded roster chunk by chunk and stream the results as CSV into ``output``.
+
+    Returns ``(output, summary)``; only one chunk is held in memory at a time.
+    ``on_chunk(result, first_row)`` is called with each scored chunk (e.g. to audit its rows).
+    """
+    ext = os.path.splitext(file_name)[1].lower()
+    if ext not in (".csv", ".parquet"):
+        raise ScreeningError(f"Unsupported file type: {ext or file_name}")
+
+    missing = missing_columns(read_columns(file, file_name), disease)
+    if missing:
+        raise ScreeningError(f"Missing required columns for {disease}: {', '.join(missing)}")
+
+    output = output if output is not None else io.BytesIO()
+    summary = {"rows": 0, "scored": 0, "positive": 0, "invalid": 0}
+    for i, chunk in enumerate(iter_chunks(file, file_name, chunk_size)):
+        result, scored, positive = score_chunk(registry, disease, chunk)
+        output.write(result.to_csv(index=False, header=(i == 0)).encode("utf-8"))
+        if on_chunk is not None:
+            on_chunk(result, summary["rows"])
+        summary["rows"] += len(chunk)
+        summary["scored"] += scored
+        summary["positive"] += positive
+        summary["invalid"] += len(chunk) - scored
+    output.seek(0)
+    return output, summary
@@ -0,0 +1,97 @@
+"""Compare the old Plotly + Kaleido gauge export with the in-process matplotlib renderer.
+
+Usage:
+    python benchmarks/bench_gauge.py [--runs 20]
+
+The Kaleido path is skipped when kaleido is not installed (it is no longer a
+requirement of the app). Its peak heap excludes the Chromium subprocess, and
+its first call (subprocess start-up) is reported separately as cold start.
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report_charts import render_gauge  # noqa: E402
+
+
+def plotly_gauge(risk_percent, disease):
+    import plotly.graph_objects as go
+    return go.Figure(go.Indicator(
+        mode="gauge+number",
+        value=risk_percent,
+        domain={'x': [0, 1], 'y': [0, 1]},
+        title={'text': f"{disease} Risk Probability (%)"},
+        gauge={
+            'axis': {'range': [0, 100]},
+            'bar': {'color': "crimson"},
+            'steps': [
+                {'range': [0, 40], 'color': "lightgreen"},
+                {'range': [40, 70], 'color': "yellow"},
+                {'range': [70, 100], 'color': "red"}
+            ],
+            'threshold': {
+                'line': {'color': "black", 'width': 4},
+                'thickness': 0.75,
+                'value': risk_percent
+            }
+        }
+    ))
+
+
+def kaleido_export(risk_percent, disease):
+    plotly_gauge(risk_percent, disease).write_image(io.BytesIO(), format="png", scale=2)
+
+
+def native_export(risk_percent, disease):
+    render_gauge(risk_percent, disease, io.BytesIO())
+
+
+def measure(fn, runs):
+    started = time.perf_counter()
+    fn(50.0, "Diabetes")  # warm-up (first Kaleido call also starts its subprocess)
+    cold_ms = (time.perf_counter() - started) * 1000
+    timings = []
+    for i in range(runs):
+        started = time.perf_counter()
+        fn(float(i * 97 % 100), "Diabetes")
+        timings.append((time.perf_counter() - started) * 1000)
+
+    # Separate pass for memory, since tracing slows down the timed runs
+    tracemalloc.start()
+    fn(50.0, "Diabetes")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "cold_ms": cold_ms,
+        "mean_ms": statistics.mean(timings),
+        "p95_ms": sorted(timings)[int(0.95 * (len(timings) - 1))],
+        "peak_python_kb": peak / 1024,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gauge export benchmark")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    paths = {"matplotlib (in-process)": native_export}
+    try:
+        import kaleido  # noqa: F401
+        paths["plotly + kaleido"] = kaleido_export
+    except ImportError:
+        print("kaleido not installed: skipping the old export path")
+
+    for name, fn in paths.items():
+        result = measure(fn, args.runs)
+        print(f"{name:26s} cold {result['cold_ms']:8.1f} ms   mean {result['mean_ms']:8.2f} ms   p95 {result['p95_ms']:8.2f} ms   "
+              f"peak Python heap {result['peak_python_kb']:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Drive the shared chat client from many simulated doctors against the offline stub.
+
+Usage:
+    python benchmarks/chat_contention.py [--users 40] [--concurrency 8] [--rpm 600]
+                                         [--failure-rate 0.2] [--latency 0.3]
+
+No network or API key is needed. Reports how many requests were in flight at
+most (never above --concurrency), retries, failures, rejections and the reply
+latency percentiles.
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat_backend import FakeGenerativeModel, StreamedReply  # noqa: E402
+from gemini_client import ChatUnavailable, GeminiClient  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rpm", type=float, default=600)
+    parser.add_argument("--burst", type=int, default=10)
+    parser.add_argument("--failure-rate", type=float, default=0.2)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--timeout", type=float, default=5.0)
+    parser.add_argument("--queue-timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    def factory(model_name, system_instruction=None):
+        return FakeGenerativeModel(model_name, system_instruction=system_instruction, first_token_delay=args.latency,
+                                   chunk_delay=0.01, failure_rate=args.failure_rate)
+
+    client = GeminiClient("stub", model_factory=factory, max_concurrency=args.concurrency,
+                          requests_per_minute=args.rpm, burst=args.burst, base_delay=0.1, max_delay=1.0,
+                          request_timeout=args.timeout, queue_timeout=args.queue_timeout)
+    latencies, outcomes = [], {"ok": 0, "busy": 0, "error": 0}
+    lock = threading.Lock()
+
+    def user(i):
+        started = time.perf_counter()
+        try:
+            reply = StreamedReply(client.stream_chat([], f"Question {i}"), started=started)
+            "".join(reply)
+            outcome = "ok"
+        except ChatUnavailable:
+            outcome = "busy"
+        except Exception:
+            outcome = "error"
+        with lock:
+            outcomes[outcome] += 1
+            if outcome == "ok":
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(args.users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    print(f"{args.users} users in {elapsed:.1f}s: {outcomes}")
+    print(f"client stats: {client.stats}")
+    if latencies:
+        latencies.sort()
+        p95 = latencies[int(0.95 * (len(latencies) - 1))]
+        print(f"reply latency: median {statistics.median(latencies):.0f} ms, p95 {p95:.0f} ms, "
+              f"max {latencies[-1]:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Check that pages start fast and leave heavy dependencies for the code paths that use them.
+
+Usage:
+    python benchmarks/import_budget.py [--runs 3] [--scale 1.5]
+
+Each scenario runs one page in a fresh interpreter (Streamlit's own import is
+excluded from the timing) and fails when
+    - a module listed as deferred for that scenario has been imported, or
+    - the median page run time exceeds its budget (multiplied by --scale on
+      slower machines).
+Exits with status 1 on any failure, so it can run in CI next to the benchmarks.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only needed once a user acts: predicting, screening a file, logging in, chatting
+HEAVY = ["numpy", "pandas", "pyarrow", "matplotlib", "fpdf", "sklearn", "scipy", "google.generativeai",
+         "pymongo", "werkzeug"]
+AFTER_LOGIN = [m for m in HEAVY if m != "numpy"]  # the model registry (NumPy) backs the disease selector
+
+# (name, page, logged in, modules that must not be imported, budget in ms)
+SCENARIOS = [
+    ("home", "home.py", False, HEAVY, 300),
+    ("login", "pages/1_Login.py", False, HEAVY, 300),
+    ("predictor_anonymous", "pages/2_Predictor.py", False, HEAVY, 300),
+    ("predictor_idle", "pages/2_Predictor.py", True, AFTER_LOGIN, 500),
+    ("chatbot_anonymous", "pages/_Chatbot.py", False, HEAVY, 300),
+    ("chatbot_idle", "pages/_Chatbot.py", True, HEAVY, 400),
+]
+
+SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({page!r}, default_timeout=120)
+if {logged_in!r}:
+    from auth_utils import issue_session_token
+    at.session_state["authenticated"] = True
+    at.session_state["email"] = "budget@example.com"
+    at.session_state["doctor_id"] = "BUDGET"
+    at.session_state["auth_token"] = issue_session_token("budget@example.com", "BUDGET")
+started = time.perf_counter()
+at.run()
+elapsed = (time.perf_counter() - started) * 1000
+print(json.dumps({{"ms": elapsed, "modules": sorted(sys.modules), "exceptions": [e.value for e in at.exception]}}))
+"""
+
+
+def run_scenario(page, logged_in):
+    script = SCRIPT.format(root=ROOT, page=os.path.join(ROOT, page), logged_in=logged_in)
+    env = dict(os.environ, CHAT_BACKEND="gemini", METRICS_PORT="")
+    out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, env=env, cwd=ROOT,
+                         check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per scenario")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget (slow machines)")
+    args = parser.parse_args()
+
+    failures = []
+    for name, page, logged_in, deferred, budget_ms in SCENARIOS:
+        runs = [run_scenario(page, logged_in) for _ in range(args.runs)]
+        median_ms = statistics.median(run["ms"] for run in runs)
+        budget_ms *= args.scale
+        loaded = [m for m in deferred if m in runs[0]["modules"]]
+        problems = []
+        if runs[0]["exceptions"]:
+            problems.append(f"page raised {runs[0]['exceptions']}")
+        if loaded:
+            problems.append(f"imported {', '.join(loaded)}")
+        if median_ms > budget_ms:
+            problems.append(f"{median_ms:.0f} ms over the {budget_ms:.0f} ms budget")
+        status = "FAIL" if problems else "ok"
+        print(f"{status:4s} {name:22s} {median_ms:7.0f} ms (budget {budget_ms:.0f} ms)"
+              + (f"  {'; '.join(problems)}" if problems else ""))
+        if problems:
+            failures.append(name)
+
+    if failures:
+        print(f"{len(failures)} scenario(s) over budget: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
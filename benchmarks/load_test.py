@@ -0,0 +1,337 @@
+"""Drive many simulated doctor sessions through the real pages in one Streamlit process.
+
+Usage:
+    python benchmarks/load_test.py [--sessions 1 10 25] [--predictions 3] [--messages 2]
+                                   [--chat-latency 0.5] [--chat-failure-rate 0.0]
+    python benchmarks/load_test.py --sessions 10 --save-baseline     # after an accepted change
+
+Each session is a thread that, like a doctor in a browser tab,
+    1. signs up, then logs in again, on pages/1_Login.py (both flows are timed
+       until the redirect has rendered pages/2_Predictor.py),
+    2. opens pages/2_Predictor.py and runs --predictions predictions,
+    3. opens pages/_Chatbot.py and sends --messages questions.
+Pages run through Streamlit's AppTest in this process, so they share
+cache_resource objects (model registry, report pool, chat client, auth
+executor) exactly as sessions of one server worker do.
+
+Nothing external is needed: MongoDB is replaced in-process by mongomock
+(pip install mongomock) and chat uses the fake Gemini backend with
+--chat-latency seconds to the first token. Inputs and questions are unique
+per session, so the prediction and chat caches do not hide the work.
+
+For every concurrency level the report lists, per flow, the throughput over
+the level's wall time and the p50/p95/p99 latency. Results are written as JSON
+(--output); with a baseline from an earlier run, a flow whose p95 got slower
+than --threshold times the baseline fails the run (exit status 1).
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from run_benchmarks import RESULTS_DIR, environment  # noqa: E402
+
+HOME_PAGE = os.path.join(ROOT, "home.py")
+FLOWS = ["signup", "login", "open_predictor", "predict", "open_chatbot", "chat"]
+
+
+def configure(args):
+    """Point the app at the in-process stand-ins. Must run before any app module is imported."""
+    os.environ.update({
+        "CHAT_BACKEND": "fake",
+        "CHAT_FAKE_LATENCY_SECONDS": str(args.chat_latency),
+        "CHAT_FAKE_FAILURE_RATE": str(args.chat_failure_rate),
+        "CHAT_CACHE_PATH": os.path.join(args.work_dir, "chat_cache.sqlite3"),
+        "AUDIT_SPILL_PATH": os.path.join(args.work_dir, "audit_spill.jsonl"),
+        "MONGO_URI": "mongodb://load-test.invalid",  # never dialled: the client below is mongomock
+        "METRICS_PORT": "",
+        "LOGIN_REDIRECT_SECONDS": "0",
+        "MODEL_RELOAD_SECONDS": "0",
+        "STREAMLIT_LOGGER_LEVEL": "error",  # report worker processes inherit this
+    })
+    os.environ.setdefault("AUTH_SECRET_KEY", "load-test")
+    try:
+        import mongomock
+    except ImportError:
+        sys.exit("The load test needs mongomock as its in-process MongoDB: pip install mongomock")
+    import database
+    database._client = mongomock.MongoClient()
+
+    # AppTest installs a mock Runtime for the duration of each run and removes it afterwards,
+    # which breaks runs overlapping on other threads; share one mock for the whole test instead
+    from unittest.mock import MagicMock
+
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+
+    # Like a server, compile each page once for all sessions (AppTest compiles on every run,
+    # and concurrent compiles trip a CPython 3.11 AST recursion check)
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    script_cache = ScriptCache()
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+
+    # Session state read from the simulating threads logs a bare-mode warning on every access
+    from streamlit.runtime.scriptrunner_utils import script_run_context
+    script_run_context._LOGGER.addFilter(lambda record: "missing ScriptRunContext" not in record.getMessage())
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)  # flow -> [(started, seconds)]
+        self.errors = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def timed(self, flow, run, check=None):
+        started = time.perf_counter()
+        try:
+            at = run()
+            problem = at.exception[0].value if at.exception else (check(at) if check else None)
+        except Exception as e:
+            problem = f"{type(e).__name__}: {e}"
+            at = None
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            if problem:
+                self.errors[flow].append(str(problem))
+            else:
+                self.samples[flow].append((started, elapsed))
+        return at, not problem
+
+
+def on_predictor(at):
+    if at.session_state["authenticated"] and any(b.label == "Predict" for b in at.button):
+        return None
+    return "; ".join(e.value for e in at.error) or "not redirected to the Predictor"
+
+
+def login_as(at, session):
+    for key, value in dict(session, authenticated=True).items():
+        at.session_state[key] = value
+
+
+def run_session(index, level, args, recorder):
+    from streamlit.testing.v1 import AppTest
+
+    from disease_config import disease_inputs
+
+    rng = random.Random(f"{level}-{index}")
+    email = f"load-{level}-{index}@example.com"
+    password = "LoadTest123"
+    doctor_id = f"LOAD-{level}-{index}"
+    time.sleep(args.ramp_up * index / max(1, level))
+
+    # 1. Signup, then a fresh tab logging in with the new account; both redirect to the Predictor
+    at = AppTest.from_file(HOME_PAGE, default_timeout=args.timeout)
+    at.switch_page("pages/1_Login.py").run()
+    at.radio[0].set_value("Signup").run()
+    for field, value in zip(at.text_input, [email, password, doctor_id, f"ORG-{level}-{index}"]):
+        field.set_value(value)
+    _, ok = recorder.timed("signup", lambda: at.button[0].click().run(), on_predictor)
+    if not ok:
+        return
+
+    at = AppTest.from_file(HOME_PAGE, default_timeout=args.timeout)
+    at.switch_page("pages/1_Login.py").run()
+    at.text_input[0].set_value(email)
+    at.text_input[1].set_value(password)
+    _, ok = recorder.timed("login", lambda: at.button[0].click().run(), on_predictor)
+    if not ok:
+        return
+    session = {key: at.session_state[key] for key in ("email", "doctor_id", "auth_token")}
+
+    # 2. Predictions with fresh inputs each time (a new tab: AppTest cannot keep widgets across pages)
+    at = AppTest.from_file(HOME_PAGE, default_timeout=args.timeout)
+    login_as(at, session)
+    _, ok = recorder.timed("open_predictor", at.switch_page("pages/2_Predictor.py").run)
+    if not ok:
+        return
+    disease = rng.choice(list(disease_inputs)) if args.disease == "random" else args.disease
+    if at.selectbox[1].value != disease:
+        at.selectbox[1].set_value(disease).run()
+    at.text_input[0].set_value(f"Patient {level}-{index}")
+    for _ in range(args.predictions):
+        for field in at.number_input[1:]:
+            field.set_value(round(rng.uniform(0.0, 150.0), 4))
+        button = next(b for b in at.button if b.label == "Predict")
+        recorder.timed("predict", lambda: button.click().run(), lambda at: None if at.get("imgs") else "no result")
+        time.sleep(args.think_time)
+
+    # 3. Chat
+    at = AppTest.from_file(HOME_PAGE, default_timeout=args.timeout)
+    login_as(at, session)
+    _, ok = recorder.timed("open_chatbot", at.switch_page("pages/_Chatbot.py").run)
+    if not ok:
+        return
+    for n in range(args.messages):
+        question = f"What lifestyle changes help patient {level}-{index}-{n} with {disease}?"
+        recorder.timed("chat", lambda: at.chat_input[0].set_value(question).run(),
+                       lambda at: None if len(at.chat_message) >= 2 else "no reply")
+        time.sleep(args.think_time)
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+def summarize(recorder):
+    report = {}
+    for flow in FLOWS:
+        samples = recorder.samples.get(flow, [])
+        errors = recorder.errors.get(flow, [])
+        if not samples and not errors:
+            continue
+        row = {"count": len(samples), "errors": len(errors)}
+        if samples:
+            latencies = sorted(seconds * 1000 for _, seconds in samples)
+            window = max(start + seconds for start, seconds in samples) - min(start for start, _ in samples)
+            row.update(
+                throughput_per_s=round(len(samples) / window, 3) if window > 0 else None,
+                p50_ms=round(statistics.median(latencies), 1),
+                p95_ms=round(percentile(latencies, 0.95), 1),
+                p99_ms=round(percentile(latencies, 0.99), 1),
+                max_ms=round(latencies[-1], 1),
+            )
+        if errors:
+            row["first_error"] = errors[0]
+        report[flow] = row
+    return report
+
+
+def run_level(level, args):
+    import metrics
+
+    recorder = Recorder()
+    metrics.registry.reset()
+    failures = []
+
+    def session(index):
+        try:
+            run_session(index, level, args, recorder)
+        except Exception:
+            failures.append(traceback.format_exc())
+
+    threads = [threading.Thread(target=session, args=(i,), name=f"doctor-{i}") for i in range(level)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    for failure in failures[:3]:
+        print(failure, file=sys.stderr)
+    # Server-side stage timings (metrics.span) behind the page-level numbers
+    stages = [{key: round(value, 1) if isinstance(value, float) else value for key, value in row.items()}
+              for row in metrics.registry.summary()]
+    return {"sessions": level, "wall_s": round(wall, 2), "crashed_sessions": len(failures),
+            "flows": summarize(recorder), "stages": stages}
+
+
+def print_level(result):
+    print(f"\n{result['sessions']} concurrent session(s), {result['wall_s']} s wall"
+          + (f", {result['crashed_sessions']} crashed" if result["crashed_sessions"] else ""))
+    print(f"  {'flow':15s} {'ok':>5s} {'err':>4s} {'ops/s':>8s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}")
+    for flow, row in result["flows"].items():
+        if row["count"]:
+            print(f"  {flow:15s} {row['count']:5d} {row['errors']:4d} {row['throughput_per_s'] or 0:8.2f} "
+                  f"{row['p50_ms']:9.1f} {row['p95_ms']:9.1f} {row['p99_ms']:9.1f}")
+        else:
+            print(f"  {flow:15s} {0:5d} {row['errors']:4d}  {row.get('first_error', '')}")
+
+
+def compare(levels, baseline, threshold, min_delta_ms):
+    """Flows whose p95 at the same concurrency got slower than ``threshold`` times the baseline."""
+    previous = {level["sessions"]: level["flows"] for level in baseline.get("levels", [])}
+    regressions = []
+    for level in levels:
+        for flow, row in level["flows"].items():
+            before = previous.get(level["sessions"], {}).get(flow)
+            if not before or not before.get("p95_ms") or not row.get("p95_ms"):
+                continue
+            if row["p95_ms"] > threshold * before["p95_ms"] and row["p95_ms"] - before["p95_ms"] > min_delta_ms:
+                regressions.append(f"{flow}@{level['sessions']}: p95 {before['p95_ms']} -> {row['p95_ms']} ms")
+            if row["errors"] > before.get("errors", 0):
+                regressions.append(f"{flow}@{level['sessions']}: {row['errors']} errors (baseline {before['errors']})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10],
+                        help="concurrency levels to run, one after the other")
+    parser.add_argument("--predictions", type=int, default=3, help="predictions per session")
+    parser.add_argument("--messages", type=int, default=2, help="chat messages per session")
+    parser.add_argument("--disease", default="random", help="disease to predict, or 'random' per session")
+    parser.add_argument("--chat-latency", type=float, default=0.5, help="fake Gemini seconds to the first token")
+    parser.add_argument("--chat-failure-rate", type=float, default=0.0, help="fake Gemini transient error rate")
+    parser.add_argument("--ramp-up", type=float, default=1.0, help="seconds over which sessions start")
+    parser.add_argument("--think-time", type=float, default=0.0, help="pause between a session's actions")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds before a page run counts as failed")
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="include model loads and worker start-up in the first level")
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "load_latest.json"))
+    parser.add_argument("--baseline", default=os.path.join(RESULTS_DIR, "load_baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="also write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=1.5, help="allowed p95 slowdown ratio per flow")
+    parser.add_argument("--min-delta-ms", type=float, default=50.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+    args.work_dir = tempfile.mkdtemp(prefix="load_test_")
+    configure(args)
+
+    if not args.no_warmup:
+        # One unrecorded session: model loads, report workers and font caches are not what we size for
+        run_session(0, 0, args, Recorder())
+
+    levels = []
+    for level in args.sessions:
+        result = run_level(level, args)
+        print_level(result)
+        levels.append(result)
+
+    settings = {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "work_dir")}
+    report = {"environment": environment(), "settings": settings, "levels": levels}
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(levels, baseline, args.threshold, args.min_delta_ms)
+        report["baseline"] = {"path": args.baseline, "regressions": regressions}
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) against the baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
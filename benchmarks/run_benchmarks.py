@@ -0,0 +1,264 @@
+"""Benchmark the app's hot paths and compare them with a saved baseline.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--repeat 20] [--only score] [--skip-cold-start]
+    python benchmarks/run_benchmarks.py --save-baseline      # after an accepted change
+
+Measured per disease in disease_inputs, with seeded synthetic inputs:
+    cold_start.<page>         fresh interpreter, first run of the page (imports included)
+    score_single.<disease>    ModelRegistry.score on one row
+    score_batch.<disease>     ModelRegistry.score on --batch-rows rows
+    bar_chart.<disease>       input-parameter bar chart rendered to PNG (report size)
+    bar_chart_page.<disease>  the same chart at the Predictor page's 200 dpi
+    contributions.<disease>   top-factor contributions chart at the page's 200 dpi
+    gauge.<disease>           risk gauge rendered to PNG
+    pdf_report.<disease>      generate_pdf_report with both images
+    hash_verify.<scheme>      verify_password for werkzeug's default (scrypt) and legacy SHA-256 hashes
+
+Results are written as JSON (--output). When a baseline exists, each median is
+compared with it and the run exits with status 1 if any benchmark got slower by
+more than the threshold ratio (and by more than --min-delta-ms). A baseline may
+carry per-benchmark ratios in its "thresholds" object.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from importlib import metadata
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+PAGES = ["home.py", "pages/1_Login.py", "pages/2_Predictor.py", "pages/_Chatbot.py"]
+PACKAGES = ["streamlit", "scikit-learn", "numpy", "matplotlib", "fpdf2", "werkzeug", "plotly", "pymongo"]
+
+# Run in a fresh interpreter so every import is paid for, as on a server restart
+COLD_START_SCRIPT = """
+import sys, time
+started = time.perf_counter()
+sys.path.insert(0, {root!r})
+from streamlit.testing.v1 import AppTest
+from auth_utils import issue_session_token
+at = AppTest.from_file({page!r}, default_timeout=120)
+at.session_state["authenticated"] = True
+at.session_state["email"] = "bench@example.com"
+at.session_state["doctor_id"] = "BENCH"
+at.session_state["auth_token"] = issue_session_token("bench@example.com", "BENCH")
+at.run()
+print((time.perf_counter() - started) * 1000)
+"""
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "median_ms": statistics.median(samples),
+        "mean_ms": statistics.fmean(samples),
+        "p95_ms": samples[int(0.95 * (len(samples) - 1))],
+        "min_ms": samples[0],
+        "runs": len(samples),
+    }
+
+
+def measure(fn, repeat, min_sample_ms=5.0):
+    """Time ``fn`` ``repeat`` times; fast calls are looped so each sample lasts ``min_sample_ms``."""
+    fn()  # warm-up: lazy loads, font caches
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if (time.perf_counter() - started) * 1000 >= min_sample_ms or number >= 10 ** 6:
+            break
+        number *= 10
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) * 1000 / number)
+    result = summarize(samples)
+    result["loops"] = number
+    return result
+
+
+def measure_cold_start(page, runs):
+    script = COLD_START_SCRIPT.format(root=ROOT, page=os.path.join(ROOT, page))
+    env = dict(os.environ, CHAT_BACKEND="fake", CHAT_CACHE_ENABLED="0")
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, env=env, cwd=ROOT,
+                             check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return summarize(samples)
+
+
+def synthetic_inputs(rng, disease, rows):
+    from disease_config import disease_inputs
+    return rng.uniform(0.0, 100.0, size=(rows, len(disease_inputs[disease]))).round(2)
+
+
+def run_benchmarks(args):
+    import numpy as np
+    from werkzeug.security import generate_password_hash
+
+    from auth_utils import verify_password
+    from disease_config import detailed_recommendations, disease_inputs
+    from model_registry import ModelRegistry
+    from report_charts import render_contributions, render_gauge, render_input_bars
+    from report_generator import generate_pdf_report
+
+    results = {}
+
+    def record(name, fn, **extra):
+        if args.only and not any(part in name for part in args.only):
+            return
+        results[name] = dict(measure(fn, args.repeat), **extra)
+        print(f"{name:45s} median {results[name]['median_ms']:10.3f} ms   p95 {results[name]['p95_ms']:10.3f} ms")
+
+    if not args.skip_cold_start:
+        for page in PAGES:
+            name = f"cold_start.{os.path.basename(page)}"
+            if args.only and not any(part in name for part in args.only):
+                continue
+            results[name] = measure_cold_start(page, args.cold_runs)
+            print(f"{name:45s} median {results[name]['median_ms']:10.3f} ms")
+
+    registry = ModelRegistry()
+    rng = np.random.default_rng(42)
+    for disease in args.diseases or list(disease_inputs):
+        single = synthetic_inputs(rng, disease, 1)
+        batch = synthetic_inputs(rng, disease, args.batch_rows)
+        inputs = dict(zip(disease_inputs[disease], single[0].tolist()))
+        labels, risk = registry.score(disease, single)
+        prediction, risk_percent = int(labels[0]), float(risk[0])
+
+        record(f"score_single.{disease}", lambda: registry.score(disease, single))
+        record(f"score_batch.{disease}", lambda: registry.score(disease, batch), rows=args.batch_rows)
+        record(f"explain_single.{disease}", lambda: registry.explain(disease, single))
+        record(f"explain_batch.{disease}", lambda: registry.explain(disease, batch), rows=args.batch_rows)
+        record(f"bar_chart.{disease}", lambda: render_input_bars(inputs, disease, io.BytesIO()))
+        record(f"bar_chart_page.{disease}", lambda: render_input_bars(inputs, disease, io.BytesIO(), dpi=200))
+        contributions = dict(zip(disease_inputs[disease], registry.explain(disease, single)[2][0].tolist()))
+        record(f"contributions.{disease}",
+               lambda: render_contributions(contributions, disease, io.BytesIO(), dpi=200))
+        record(f"gauge.{disease}", lambda: render_gauge(risk_percent, disease, io.BytesIO()))
+
+        gauge_png = render_gauge(risk_percent, disease, io.BytesIO()).getvalue()
+        bars_png = render_input_bars(inputs, disease, io.BytesIO()).getvalue()
+        record(f"pdf_report.{disease}", lambda: generate_pdf_report(
+            patient_name="Bench Patient", age=50, sex="Female", doctor_email="bench@example.com",
+            doctor_id="BENCH", org_id="ORG", disease=disease, input_data=inputs, prediction=prediction,
+            recommendation=detailed_recommendations[disease][prediction],
+            risk_image=io.BytesIO(gauge_png), inputbar_image=io.BytesIO(bars_png)
+        ))
+
+    import hashlib
+    password = "correct horse battery staple"
+    default_hash = generate_password_hash(password)
+    legacy_hash = hashlib.sha256(password.encode()).hexdigest()
+    record("hash_verify.werkzeug_default", lambda: verify_password(password, default_hash))
+    record("hash_verify.legacy_sha256", lambda: verify_password(password, legacy_hash))
+    return results
+
+
+def environment():
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=ROOT).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "packages": versions,
+    }
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """Per-benchmark comparison of medians against ``baseline``; returns ``(rows, regressions)``."""
+    limits = baseline.get("thresholds", {})
+    rows, regressions = {}, []
+    for name, result in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            rows[name] = {"status": "new"}
+            continue
+        ratio = result["median_ms"] / previous["median_ms"] if previous["median_ms"] else float("inf")
+        limit = limits.get(name, threshold)
+        delta = result["median_ms"] - previous["median_ms"]
+        if ratio > limit and delta > min_delta_ms:
+            status = "regressed"
+            regressions.append(name)
+        elif ratio < 1 / limit and -delta > min_delta_ms:
+            status = "improved"
+        else:
+            status = "ok"
+        rows[name] = {"status": status, "baseline_ms": previous["median_ms"], "ratio": round(ratio, 3),
+                      "threshold": limit}
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20, help="timed samples per benchmark")
+    parser.add_argument("--batch-rows", type=int, default=10000)
+    parser.add_argument("--cold-runs", type=int, default=3, help="fresh interpreters per page")
+    parser.add_argument("--skip-cold-start", action="store_true")
+    parser.add_argument("--diseases", nargs="*", help="limit the per-disease benchmarks")
+    parser.add_argument("--only", nargs="*", help="run benchmarks whose name contains any of these")
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "latest.json"))
+    parser.add_argument("--baseline", default=os.path.join(RESULTS_DIR, "baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="also write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=1.25, help="allowed slowdown ratio of the median")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args)
+    report = {"environment": environment(), "settings": {"repeat": args.repeat, "batch_rows": args.batch_rows},
+              "results": results}
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["baseline"] = {"path": args.baseline, "environment": baseline.get("environment")}
+        report["comparison"], regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        for name, row in report["comparison"].items():
+            if row["status"] in ("regressed", "improved"):
+                print(f"{row['status'].upper():10s} {name}: {row['ratio']:.2f}x baseline "
+                      f"({row['baseline_ms']:.3f} -> {results[name]['median_ms']:.3f} ms)")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed beyond the threshold: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import os
+import random
+import time
+
+
+class StreamedReply:
+    """Iterates over the text chunks of a streamed model reply and times them.
+
+    Pass an instance to ``st.write_stream``; afterwards ``ttft_ms`` holds the
+    time to first token and ``total_ms`` the time to the last chunk.
+    """
+
+    def __init__(self, response, started=None):
+        self.response = response
+        self.started = started if started is not None else time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+
+    def __iter__(self):
+        for chunk in self.response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Gemini raises for chunks without text (e.g. a safety-blocked candidate)
+                continue
+            if not text:
+                continue
+            if self.first_token_at is None:
+                self.first_token_at = time.perf_counter()
+            yield text
+        self.finished_at = time.perf_counter()
+
+    @property
+    def ttft_ms(self):
+        if self.first_token_at is None:
+            return None
+        return (self.first_token_at - self.started) * 1000
+
+    @property
+    def total_ms(self):
+        if self.finished_at is None:
+            return None
+        return (self.finished_at - self.started) * 1000
+
+
+# Local stand-in for google.generativeai, for offline runs and tests (CHAT_BACKEND=fake)
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeServiceUnavailable(Exception):
+    """Stands in for the provider's 503 so retries can be exercised offline."""
+    code = 503
+
+
+class FakeChatSession:
+    def __init__(self, model, history=None):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, content, stream=False, request_options=None):
+        self.model.maybe_fail(request_options)
+        reply = self.model.reply_for(content)
+        self.history.append({"role": "user", "parts": [content]})
+        self.history.append({"role": "model", "parts": [reply]})
+        chunks = self.model.chunk(reply)
+        if not stream:
+            time.sleep(self.model.first_token_delay + self.model.chunk_delay * len(chunks))
+            return FakeChunk(reply)
+        return self._stream(chunks)
+
+    def _stream(self, chunks):
+        time.sleep(self.model.first_token_delay)
+        for i, text in enumerate(chunks):
+            if i:
+                time.sleep(self.model.chunk_delay)
+            yield FakeChunk(text)
+
+
+class FakeGenerativeModel:
+    def __init__(self, model_name="fake-model", reply=None, first_token_delay=0.2, chunk_delay=0.02,
+                 words_per_chunk=4, system_instruction=None, failure_rate=0.0):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.reply = reply
+        self.first_token_delay = first_token_delay
+        self.chunk_delay = chunk_delay
+        self.words_per_chunk = words_per_chunk
+        self.failure_rate = failure_rate
+
+    def maybe_fail(self, request_options=None):
+        timeout = (request_options or {}).get("timeout")
+        if timeout is not None and self.first_token_delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("Simulated request timeout")
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise FakeServiceUnavailable("Simulated overload (503)")
+
+    def reply_for(self, content):
+        if self.reply is not None:
+            return self.reply
+        question = content.strip().splitlines()[-1] if content.strip() else ""
+        return f"This is a simulated answer from the offline test model to: {question}"
+
+    def chunk(self, text):
+        words = text.split(" ")
+        n = self.words_per_chunk
+        return [" ".join(words[i:i + n]) + (" " if i + n < len(words) else "") for i in range(0, len(words), n)]
+
+    def start_chat(self, history=None):
+        return FakeChatSession(self, history)
+
+    def generate_content(self, contents, request_options=None):
+        self.maybe_fail(request_options)
+        time.sleep(self.first_token_delay)
+        return FakeChunk(self.reply_for(contents))
+
+
+def create_model(model_name, system_instruction=None):
+    if os.getenv("CHAT_BACKEND", "gemini").lower() == "fake":
+        return FakeGenerativeModel(
+            model_name,
+            system_instruction=system_instruction,
+            first_token_delay=float(os.getenv("CHAT_FAKE_LATENCY_SECONDS", "0.2")),
+            failure_rate=float(os.getenv("CHAT_FAKE_FAILURE_RATE", "0")),
+        )
+    import google.generativeai as genai
+    return genai.GenerativeModel(model_name, system_instruction=system_instruction)
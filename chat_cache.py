@@ -0,0 +1,120 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from disease_config import BASE_DIR
+
+DEFAULT_CACHE_PATH = os.path.join(BASE_DIR, ".cache", "chat_responses.sqlite3")
+
+
+def normalize_question(question):
+    # "What is the  dose of Metformin?" and "what is the dose of metformin" share an entry
+    text = re.sub(r"\s+", " ", question.strip().lower())
+    return text.rstrip(" ?.!")
+
+
+class ResponseCache:
+    """SQLite-backed cache of chatbot answers, shared by all sessions, processes and restarts.
+
+    Keys hold no conversation context, so only questions asked at the start of
+    a chat may be looked up or stored.
+
+    Entries expire after ``ttl_seconds``; beyond ``max_entries`` the least
+    recently used entries are evicted.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=5000, ttl_seconds=7 * 86400):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    answer TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._conn.execute("INSERT OR IGNORE INTO stats VALUES ('hits', 0), ('misses', 0)")
+
+    @staticmethod
+    def make_key(question, system_prompt, model_name):
+        raw = "\x1f".join([model_name, system_prompt, normalize_question(question)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, question, system_prompt, model_name):
+        key = self.make_key(question, system_prompt, model_name)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT answer, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] < now - self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self._conn.execute("UPDATE stats SET value = value + 1 WHERE name = 'misses'")
+                return None
+            self._conn.execute(
+                "UPDATE responses SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+            self._conn.execute("UPDATE stats SET value = value + 1 WHERE name = 'hits'")
+            return row[0]
+
+    def put(self, question, system_prompt, model_name, answer):
+        key = self.make_key(question, system_prompt, model_name)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, answer, created_at, last_access, hits) "
+                "VALUES (?, ?, ?, ?, 0)", (key, answer, now, now)
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        self._conn.execute("""
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,))
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._conn.execute("SELECT name, value FROM stats").fetchall())
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "entries": entries,
+            "hits": counters["hits"],
+            "misses": counters["misses"],
+            "hit_rate": counters["hits"] / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.execute("UPDATE stats SET value = 0")
+
+
+def response_cache_from_env():
+    # Set CHAT_CACHE_ENABLED=0 to send every question to the model
+    if os.getenv("CHAT_CACHE_ENABLED", "1") == "0":
+        return None
+    return ResponseCache(
+        path=os.getenv("CHAT_CACHE_PATH", DEFAULT_CACHE_PATH),
+        max_entries=int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "5000")),
+        ttl_seconds=float(os.getenv("CHAT_CACHE_TTL_SECONDS", str(7 * 86400))),
+    )
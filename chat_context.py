@@ -0,0 +1,87 @@
+import os
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKENS", "4000"))
+KEEP_RECENT_MESSAGES = int(os.getenv("CHAT_KEEP_RECENT_MESSAGES", "6"))
+SUMMARY_MAX_CHARS = 2000
+
+SUMMARY_PROMPT = (
+    "Summarize the following conversation between a doctor and a medical assistant AI in a few "
+    "short bullet points. Keep patient details, medications, doses and open questions.\n\n"
+)
+
+
+def estimate_tokens(text):
+    # Rough count (about 4 characters per token); avoids an API call per message
+    return len(text) // 4 + 1
+
+
+def extractive_summary(previous, messages, max_chars=SUMMARY_MAX_CHARS):
+    # Fallback when the model cannot summarize: keep the first sentence of each message
+    lines = [previous] if previous else []
+    for msg in messages:
+        first = msg["content"].strip().split("\n")[0].split(". ")[0]
+        lines.append(f"- {'Doctor' if msg['role'] == 'user' else 'Assistant'}: {first[:200]}")
+    return "\n".join(lines)[-max_chars:]
+
+
+def model_summarizer(model):
+    """Summarizer that asks the chat model itself, falling back to an extractive summary."""
+    def summarize(previous, messages):
+        transcript = "\n".join(
+            f"{'Doctor' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}" for msg in messages
+        )
+        prompt = SUMMARY_PROMPT
+        if previous:
+            prompt += f"Summary so far:\n{previous}\n\nNew messages:\n"
+        try:
+            return model.generate_content(prompt + transcript).text.strip()[:SUMMARY_MAX_CHARS]
+        except Exception:
+            return extractive_summary(previous, messages)
+    return summarize
+
+
+class ChatContext:
+    """What is sent upstream for a conversation: a rolling summary plus the recent messages.
+
+    The system prompt is set once on the model (``system_instruction``) instead of
+    being repeated in every message. When the recent messages exceed the token
+    budget, the older ones are folded into the summary so the context stays bounded.
+    """
+
+    def __init__(self, budget_tokens=CONTEXT_TOKEN_BUDGET, keep_recent=KEEP_RECENT_MESSAGES):
+        self.budget_tokens = budget_tokens
+        self.keep_recent = keep_recent
+        self.summary = ""
+        self.messages = []
+
+    def add(self, role, content):
+        self.messages.append({"role": role, "content": content})
+
+    def tokens(self):
+        return estimate_tokens(self.summary) + sum(estimate_tokens(m["content"]) for m in self.messages)
+
+    def compact(self, summarize):
+        if self.tokens() <= self.budget_tokens or len(self.messages) <= self.keep_recent:
+            return False
+        older = self.messages[:-self.keep_recent]
+        self.messages = self.messages[-self.keep_recent:]
+        self.summary = summarize(self.summary, older)
+        return True
+
+    def model_history(self):
+        history = []
+        if self.summary:
+            history.append({"role": "user", "parts": [f"Summary of our earlier conversation:\n{self.summary}"]})
+            history.append({"role": "model", "parts": ["Understood, I will take that into account."]})
+        for msg in self.messages:
+            history.append({"role": "user" if msg["role"] == "user" else "model", "parts": [msg["content"]]})
+        return history
+
+
+def page_of(messages, page_size, page=None):
+    """Messages for ``page`` (1 = oldest, default newest) and the number of pages."""
+    pages = max(1, -(-len(messages) // page_size))
+    page = pages if page is None else min(max(1, page), pages)
+    # Pages are counted back from the newest message so the latest page is always full
+    end = len(messages) - (pages - page) * page_size
+    return messages[max(0, end - page_size):end], pages
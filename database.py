@@ -0,0 +1,93 @@
+import os
+import re
+import threading
+import warnings
+
+from dotenv import load_dotenv
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from pymongo.errors import OperationFailure
+
+# Load .env variables
+load_dotenv()
+MONGO_URI = os.getenv("MONGO_URI")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "disease_predictor")
+
+_client = None
+_indexed = set()
+_index_failed = set()
+_lock = threading.Lock()
+
+
+def get_client():
+    """One pooled MongoClient per process, shared by every page and session."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = MongoClient(
+                    MONGO_URI,
+                    maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", "50")),
+                    minPoolSize=int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+                    maxIdleTimeMS=int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+                    serverSelectionTimeoutMS=int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+                )
+    return _client
+
+
+def get_database():
+    return get_client()[MONGO_DB_NAME]
+
+
+def _ensure_indexes(name, create):
+    if name in _indexed:
+        return
+    with _lock:
+        if name in _indexed:
+            return
+        try:
+            create()
+        except OperationFailure as e:
+            # Usually existing duplicate documents; callers check for duplicates themselves instead
+            warnings.warn(f"Could not create indexes on {name}, falling back to checks before writes: {e}")
+            _index_failed.add(name)
+        _indexed.add(name)
+
+
+def indexes_missing(name):
+    """True when the indexes of collection ``name`` could not be created, so uniqueness is not enforced."""
+    return name in _index_failed
+
+
+def get_users_collection():
+    users = get_database()["users"]
+
+    def create():
+        users.create_index([("email", ASCENDING)], unique=True)
+        # Sparse: older accounts may not have a doctor or organization ID
+        users.create_index([("doctor_id", ASCENDING)], unique=True, sparse=True)
+        users.create_index([("organization_id", ASCENDING)], unique=True, sparse=True)
+
+    _ensure_indexes("users", create)
+    return users
+
+
+def duplicate_key_field(error):
+    """Name of the field that made an insert violate a unique index."""
+    key_pattern = (error.details or {}).get("keyPattern") or {}
+    if key_pattern:
+        return next(iter(key_pattern))
+    # Older servers only name the index in the message, e.g. "index: email_1 dup key"
+    match = re.search(r"index: (\w+?)_-?1\b", str(error))
+    return match.group(1) if match else None
+
+
+def get_audit_collection():
+    audit = get_database()["prediction_audit"]
+
+    def create():
+        # "Predictions by this doctor, newest first" and date-range reports
+        audit.create_index([("doctor_id", ASCENDING), ("created_at", DESCENDING)])
+        audit.create_index([("created_at", DESCENDING)])
+
+    _ensure_indexes("prediction_audit", create)
+    return audit
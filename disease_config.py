@@ -0,0 +1,132 @@
+import os
+
+# Shared disease configuration (used by the Streamlit pages and helper modules)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+
+# Model artifact per disease (file name inside MODELS_DIR)
+model_files = {
+    'Diabetes': 'diabetes_model.sav',
+    'Heart Disease': 'heart_disease_model.sav',
+    "Parkinson's": 'parkinsons_model.sav',
+    'Breast Cancer': 'breast_cancer_model.sav'
+}
+
+# Model class that means "at risk" for each disease. The breast cancer model was
+# trained on the sklearn dataset, where 0 = malignant and 1 = benign.
+positive_class = {
+    'Diabetes': 1,
+    'Heart Disease': 1,
+    "Parkinson's": 1,
+    'Breast Cancer': 0
+}
+
+# Input features per disease, in the order the models were trained on
+disease_inputs = {
+    'Diabetes': [
+        'Number of Pregnancies', 'Glucose Level', 'Blood Pressure',
+        'Skin Thickness', 'Insulin Level', 'BMI',
+        'Diabetes Pedigree Function', 'Age'
+    ],
+    'Heart Disease': [
+        'Age', 'Sex (1=Male, 0=Female)', 'Chest Pain types',
+        'Resting Blood Pressure', 'Serum Cholestoral in mg/dl',
+        'Fasting Blood Sugar > 120 mg/dl (1 = true; 0 = false)',
+        'Resting Electrocardiographic results (0,1,2)',
+        'Maximum Heart Rate achieved', 'Exercise Induced Angina (1 = yes; 0 = no)',
+        'ST depression', 'Slope of the peak exercise ST segment',
+        'Number of major vessels (0-3)', 'Thal (1 = normal; 2 = fixed defect; 3 = reversable defect)'
+    ],
+    "Parkinson's": [
+        'MDVP:Fo(Hz)', 'MDVP:Fhi(Hz)', 'MDVP:Flo(Hz)', 'MDVP:Jitter(%)',
+        'MDVP:Jitter(Abs)', 'MDVP:RAP', 'MDVP:PPQ', 'Jitter:DDP',
+        'MDVP:Shimmer', 'MDVP:Shimmer(dB)', 'Shimmer:APQ3', 'Shimmer:APQ5',
+        'MDVP:APQ', 'Shimmer:DDA', 'NHR', 'HNR', 'RPDE', 'DFA',
+        'spread1', 'spread2', 'D2', 'PPE'
+    ],
+    'Breast Cancer': [
+        'Mean Radius', 'Mean Texture', 'Mean Perimeter', 'Mean Area',
+        'Mean Smoothness', 'Mean Compactness', 'Mean Concavity',
+        'Mean Concave Points', 'Mean Symmetry', 'Mean Fractal Dimension',
+        'SE Radius', 'SE Texture', 'SE Perimeter', 'SE Area',
+        'SE Smoothness', 'SE Compactness', 'SE Concavity',
+        'SE Concave Points', 'SE Symmetry', 'SE Fractal Dimension',
+        'Worst Radius', 'Worst Texture', 'Worst Perimeter', 'Worst Area',
+        'Worst Smoothness', 'Worst Compactness', 'Worst Concavity',
+        'Worst Concave Points', 'Worst Symmetry', 'Worst Fractal Dimension'
+    ]
+}
+
+# Recommendation text shown in the PDF report, by disease and predicted label
+detailed_recommendations = {
+    'Diabetes': {
+        1: """Positive Diagnosis - At Risk:
+- Maintain strict blood glucose monitoring.
+- Follow a diabetes-friendly diet rich in fiber, vegetables, and lean proteins.
+- Engage in regular physical activity (at least 30 minutes daily).
+- Avoid sugary foods and beverages.
+- Schedule regular check-ups with your healthcare provider.
+- Consider medication adherence and insulin therapy if prescribed.
+- Monitor for symptoms like excessive thirst, frequent urination, and fatigue.
+""",
+        0: """Negative Diagnosis - Not At Risk:
+- Maintain a balanced diet and healthy lifestyle to prevent diabetes.
+- Continue regular physical activity.
+- Monitor blood sugar levels periodically.
+- Stay informed about risk factors such as family history or weight changes.
+- Schedule routine health screenings.
+"""
+    },
+    'Heart Disease': {
+        1: """Positive Diagnosis - At Risk:
+- Follow a heart-healthy diet low in saturated fats, cholesterol, and sodium.
+- Control blood pressure and cholesterol levels with medication if prescribed.
+- Avoid tobacco and limit alcohol consumption.
+- Engage in moderate exercise as advised by your cardiologist.
+- Manage stress through relaxation techniques or counseling.
+- Monitor symptoms such as chest pain, shortness of breath, or palpitations.
+- Regular cardiology follow-ups and diagnostic tests are recommended.
+""",
+        0: """Negative Diagnosis - Not At Risk:
+- Maintain a balanced diet and regular exercise routine.
+- Avoid smoking and limit alcohol intake.
+- Monitor blood pressure and cholesterol levels periodically.
+- Manage stress and maintain a healthy weight.
+- Schedule regular cardiovascular health check-ups.
+"""
+    },
+    "Parkinson's": {
+        1: """Positive Diagnosis - At Risk:
+- Consult a neurologist promptly for detailed assessment.
+- Discuss medication options that can help manage symptoms.
+- Engage in physical therapy to improve mobility and balance.
+- Consider occupational therapy for daily activity support.
+- Monitor symptoms progression and report any changes immediately.
+- Maintain a supportive social and family environment.
+""",
+        0: """Negative Diagnosis - Not At Risk:
+- Maintain an active lifestyle with regular exercise.
+- Stay mentally engaged with activities like puzzles or reading.
+- Avoid exposure to toxins and harmful chemicals.
+- Monitor for any new or worsening symptoms.
+- Schedule routine neurological check-ups if risk factors exist.
+"""
+    },
+    'Breast Cancer': {
+        1: """Positive Diagnosis - At Risk:
+- Schedule an appointment with an oncologist immediately.
+- Follow through with recommended diagnostic tests (biopsy, imaging).
+- Discuss treatment options including surgery, chemotherapy, or radiation.
+- Maintain emotional and psychological support via counseling or support groups.
+- Inform family members about genetic risk factors if applicable.
+- Follow up regularly and adhere to prescribed treatment plans.
+""",
+        0: """Negative Diagnosis - Not At Risk:
+- Perform regular breast self-examinations.
+- Schedule routine mammograms and screenings as per guidelines.
+- Maintain a healthy diet and exercise regularly.
+- Avoid known carcinogens such as tobacco and excessive alcohol.
+- Stay vigilant for any changes or lumps and consult a doctor promptly.
+"""
+    }
+}
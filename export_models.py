@@ -0,0 +1,121 @@
+"""Export the pickled scikit-learn models to compact NumPy artifacts.
+
+Usage:
+    python export_models.py           # write models/*.npz and check parity
+    python export_models.py --check   # only check existing .npz files against the pickles
+    python export_models.py --version 2   # export models/<stem>.v2.sav to <stem>.v2.npz
+
+The Predictor page scores with the .npz artifacts through scoring.LinearModel,
+so scikit-learn is only needed here, when the models change. Running pages and
+the prediction service pick up a new version within MODEL_RELOAD_SECONDS.
+"""
+import argparse
+import hashlib
+import os
+import pickle
+import sys
+import warnings
+
+import numpy as np
+
+from disease_config import MODELS_DIR, model_files, disease_inputs
+from scoring import LinearModel
+
+
+def versioned_path(disease, extension, models_dir=MODELS_DIR, version=None):
+    stem = os.path.splitext(model_files[disease])[0]
+    if version is not None:
+        stem += f".v{version}"
+    return os.path.join(models_dir, stem + extension)
+
+
+def artifact_path(disease, models_dir=MODELS_DIR, version=None):
+    return versioned_path(disease, ".npz", models_dir, version)
+
+
+def load_pickle(disease, models_dir=MODELS_DIR, version=None):
+    path = versioned_path(disease, ".sav", models_dir, version)
+    with open(path, "rb") as f:
+        raw = f.read()
+    return pickle.loads(raw), hashlib.sha256(raw).hexdigest()
+
+
+def export_model(disease, models_dir=MODELS_DIR, version=None):
+    model, sha256 = load_pickle(disease, models_dir, version)
+
+    if getattr(model, "kernel", "linear") != "linear":
+        raise ValueError(f"{disease}: only linear models can be exported (kernel={model.kernel})")
+    coef = np.asarray(model.coef_, dtype=np.float64)
+    if coef.shape != (1, len(disease_inputs[disease])):
+        raise ValueError(f"{disease}: unexpected coefficient shape {coef.shape}")
+
+    import sklearn
+    path = artifact_path(disease, models_dir, version)
+    # Written aside and renamed into place, so a running app never reads half a file
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(
+            f,
+            coef=coef.ravel(),
+            intercept=np.float64(model.intercept_[0]),
+            classes=np.asarray(model.classes_),
+            kind=np.str_("logistic" if hasattr(model, "predict_proba") else "svm"),
+            estimator=np.str_(type(model).__name__),
+            source_sha256=np.str_(sha256),
+            sklearn_version=np.str_(getattr(model, "_sklearn_version", sklearn.__version__)),
+        )
+    os.replace(tmp_path, path)
+    return path
+
+
+def check_parity(disease, models_dir=MODELS_DIR, n_samples=2000, seed=0, version=None):
+    model, _ = load_pickle(disease, models_dir, version)
+    kernel = LinearModel.from_npz(artifact_path(disease, models_dir, version))
+
+    # Random inputs on a wide range of scales, plus an all-zeros row
+    rng = np.random.default_rng(seed)
+    n_features = len(disease_inputs[disease])
+    X = rng.normal(size=(n_samples, n_features)) * rng.choice([0.01, 1.0, 100.0], size=(n_samples, 1))
+    X[0] = 0.0
+
+    labels, proba = kernel.score(X)
+    with warnings.catch_warnings():
+        # Some models were fitted on DataFrames; plain arrays are what the app passes too
+        warnings.simplefilter("ignore", UserWarning)
+        expected_labels = model.predict(X)
+        if hasattr(model, "predict_proba"):
+            expected = model.predict_proba(X)[:, 1]
+        else:
+            from scipy.special import expit
+            expected = expit(model.decision_function(X))
+    if not np.array_equal(labels, expected_labels):
+        return False, "labels differ"
+    max_err = float(np.max(np.abs(proba - expected)))
+    if max_err > 1e-9:
+        return False, f"probabilities differ by up to {max_err:.3g}"
+    return True, f"max probability error {max_err:.3g}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--check", action="store_true", help="only verify existing artifacts")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--version", type=int,
+                        help="use the <stem>.v<N>.sav pickles (diseases without one are skipped)")
+    args = parser.parse_args(argv)
+
+    ok = True
+    for disease in model_files:
+        if args.version is not None and not os.path.exists(
+                versioned_path(disease, ".sav", args.models_dir, args.version)):
+            continue
+        if not args.check:
+            print(f"Exported {disease} -> {export_model(disease, args.models_dir, args.version)}")
+        passed, detail = check_parity(disease, args.models_dir, version=args.version)
+        print(f"{'PASS' if passed else 'FAIL'} {disease}: {detail}")
+        ok = ok and passed
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
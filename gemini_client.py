@@ -0,0 +1,184 @@
+import os
+import random
+import threading
+import time
+
+from chat_backend import create_model
+
+# Errors worth retrying: rate limits, overload, timeouts and dropped connections.
+# Matched by name so this module does not need google.api_core at import time.
+TRANSIENT_ERRORS = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "Aborted", "RetryError",
+}
+TRANSIENT_CODES = {429, 500, 502, 503, 504}
+
+
+class ChatUnavailable(Exception):
+    """The shared client could not get a request slot in time (too many concurrent users)."""
+
+
+def is_transient(error):
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in TRANSIENT_ERRORS:
+        return True
+    return getattr(error, "code", None) in TRANSIENT_CODES
+
+
+class TokenBucket:
+    """Allows ``rate`` requests per second on average with bursts of up to ``capacity``."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class GeminiClient:
+    """Process-wide gateway to the chat model shared by every chatbot session.
+
+    Limits how many requests are in flight (semaphore) and how fast new ones
+    start (token bucket), applies a per-request timeout, and retries transient
+    failures with jittered exponential backoff. Streams are only retried before
+    their first chunk, so a reply is never duplicated.
+    """
+
+    def __init__(self, model_name, model_factory=create_model, max_concurrency=8, requests_per_minute=60,
+                 burst=10, max_retries=3, base_delay=0.5, max_delay=8.0, request_timeout=60.0,
+                 queue_timeout=30.0):
+        self.model_name = model_name
+        self.model_factory = model_factory
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.request_timeout = request_timeout
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self._models = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "failures": 0, "rejected": 0,
+                      "in_flight": 0, "max_in_flight": 0}
+
+    def model(self, system_instruction=None):
+        key = system_instruction or ""
+        if key not in self._models:
+            with self._lock:
+                if key not in self._models:
+                    self._models[key] = self.model_factory(self.model_name, system_instruction=system_instruction)
+        return self._models[key]
+
+    def _count(self, name, delta=1):
+        with self._lock:
+            self.stats[name] += delta
+            if name == "in_flight":
+                self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+
+    def _acquire(self):
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self._count("rejected")
+            raise ChatUnavailable("The assistant is busy right now. Please try again in a moment.")
+        remaining = self.queue_timeout - (time.monotonic() - started)
+        if not self._bucket.acquire(timeout=max(0.0, remaining)):
+            self._slots.release()
+            self._count("rejected")
+            raise ChatUnavailable("The assistant is receiving too many requests. Please try again in a moment.")
+        self._count("in_flight")
+
+    def _release(self):
+        self._count("in_flight", -1)
+        self._slots.release()
+
+    def _backoff(self, attempt):
+        # Full jitter: spreads retries from many sessions instead of synchronizing them
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _call(self, fn):
+        attempt = 0
+        while True:
+            self._count("requests")
+            try:
+                return fn()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_transient(e):
+                    self._count("failures")
+                    raise
+                attempt += 1
+                self._count("retries")
+                time.sleep(self._backoff(attempt))
+                self._bucket.acquire(timeout=self.queue_timeout)
+
+    def _request_options(self):
+        return {"timeout": self.request_timeout}
+
+    def generate_content(self, contents, system_instruction=None):
+        model = self.model(system_instruction)
+        self._acquire()
+        try:
+            return self._call(lambda: model.generate_content(contents, request_options=self._request_options()))
+        finally:
+            self._release()
+
+    def stream_chat(self, history, message, system_instruction=None):
+        """Yield the reply chunks for ``message`` sent after ``history``."""
+        model = self.model(system_instruction)
+
+        def first_chunk():
+            response = model.start_chat(history=history).send_message(
+                message, stream=True, request_options=self._request_options()
+            )
+            iterator = iter(response)
+            return next(iterator, None), iterator
+
+        self._acquire()
+        try:
+            first, rest = self._call(first_chunk)
+            if first is not None:
+                yield first
+            yield from rest
+        finally:
+            self._release()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_gemini_client(model_name):
+    """The shared client for this process, configured once from the environment."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if os.getenv("CHAT_BACKEND", "gemini").lower() != "fake":
+                    import google.generativeai as genai
+                    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+                _client = GeminiClient(
+                    model_name,
+                    max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")),
+                    requests_per_minute=float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60")),
+                    burst=int(os.getenv("GEMINI_BURST", "10")),
+                    max_retries=int(os.getenv("GEMINI_MAX_RETRIES", "3")),
+                    request_timeout=float(os.getenv("GEMINI_TIMEOUT_SECONDS", "60")),
+                    queue_timeout=float(os.getenv("GEMINI_QUEUE_TIMEOUT_SECONDS", "30")),
+                )
+    return _client
@@ -1,5 +1,6 @@
 
 import streamlit as st
+from auth_utils import end_session, session_is_valid
 
 # Set up the page
 st.set_page_config(
@@ -21,12 +22,10 @@ with st.sidebar:
     st.title("Sumit HealthCare 🏥")
     st.markdown("---")
 
-    if st.session_state.authenticated:
+    if session_is_valid(st.session_state):
         st.success(f"Logged in as **{st.session_state.email}**")
         if st.button("🚪 Logout"):
-            st.session_state.authenticated = False
-            st.session_state.email = None
-            st.session_state.doctor_id = None
+            end_session(st.session_state)
             st.success("You have been logged out.")
             st.rerun()
     else:
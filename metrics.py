@@ -0,0 +1,224 @@
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Set METRICS_ENABLED=0 to turn every span into a no-op
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+# Upper bounds in seconds, from a fast model score to a slow cold model load
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+        self.errors = 0
+
+    def observe(self, seconds, error=False):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+        if error:
+            self.errors += 1
+
+    def quantile(self, q):
+        """Estimate like Prometheus' histogram_quantile: interpolate inside the bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+class _Span:
+    __slots__ = ("registry", "stage", "started")
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(self.stage, time.perf_counter() - self.started, error=exc_type is not None)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class MetricsRegistry:
+    """Per-stage latency histograms for this process.
+
+    ``with registry.span("predict"):`` times a block. When disabled, ``span``
+    returns a shared no-op object, so instrumented code pays one attribute
+    check per call.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED, buckets=BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def span(self, stage):
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, stage)
+
+    def observe(self, stage, seconds, error=False):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram(self.buckets)
+            histogram.observe(seconds, error)
+        samples = getattr(self._local, "samples", None)
+        if samples is not None:
+            samples.append((stage, seconds))
+
+    def recording(self):
+        """Also collect ``(stage, seconds)`` pairs observed on this thread, e.g. to send them
+        back from a worker process."""
+        return _Recording(self._local)
+
+    def summary(self):
+        with self._lock:
+            return [
+                {
+                    "stage": stage,
+                    "count": h.count,
+                    "errors": h.errors,
+                    "mean_ms": h.total / h.count * 1000,
+                    "p50_ms": h.quantile(0.5) * 1000,
+                    "p95_ms": h.quantile(0.95) * 1000,
+                }
+                for stage, h in sorted(self._histograms.items())
+            ]
+
+    def render_prometheus(self):
+        lines = [
+            "# HELP app_stage_duration_seconds Time spent in each stage of a request.",
+            "# TYPE app_stage_duration_seconds histogram",
+        ]
+        errors = []
+        with self._lock:
+            for stage, h in sorted(self._histograms.items()):
+                label = stage.replace("\\", "\\\\").replace('"', '\\"')
+                cumulative = 0
+                for bound, n in zip(self.buckets + (float("inf"),), h.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'app_stage_duration_seconds_bucket{{stage="{label}",le="{le}"}} {cumulative}')
+                lines.append(f'app_stage_duration_seconds_sum{{stage="{label}"}} {h.total}')
+                lines.append(f'app_stage_duration_seconds_count{{stage="{label}"}} {h.count}')
+                errors.append(f'app_stage_errors_total{{stage="{label}"}} {h.errors}')
+        lines += ["# HELP app_stage_errors_total Stages that ended with an exception.",
+                  "# TYPE app_stage_errors_total counter"] + errors
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+class _Recording:
+    def __init__(self, local):
+        self._local = local
+
+    def __enter__(self):
+        self._local.samples = []
+        return self._local.samples
+
+    def __exit__(self, exc_type, exc, tb):
+        self._local.samples = None
+        return False
+
+
+registry = MetricsRegistry()
+span = registry.span
+observe = registry.observe
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def serve_from_env():
+    """Start the /metrics endpoint once per process when METRICS_PORT is set."""
+    global _server
+    port = os.getenv("METRICS_PORT")
+    if not port or not registry.enabled or _server is not None:
+        return _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((os.getenv("METRICS_HOST", "127.0.0.1"), int(port)), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server
+
+
+def is_admin(email):
+    admins = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
+    return bool(email) and email.lower() in admins
+
+
+def admin_panel(email):
+    """Sidebar latency table for accounts listed in ADMIN_EMAILS."""
+    if not registry.enabled or not is_admin(email):
+        return
+    import streamlit as st
+
+    with st.sidebar.expander("📈 Latency metrics"):
+        rows = registry.summary()
+        if not rows:
+            st.caption("No requests timed yet.")
+            return
+        st.dataframe(
+            [{**row, **{k: round(row[k], 1) for k in ("mean_ms", "p50_ms", "p95_ms")}} for row in rows],
+            hide_index=True,
+        )
+        st.download_button("Prometheus metrics", registry.render_prometheus(), file_name="metrics.txt",
+                           mime="text/plain", on_click="ignore")
@@ -0,0 +1,404 @@
+import hashlib
+import os
+import pickle
+import re
+import threading
+import time
+import warnings
+
+import numpy as np
+
+import metrics
+from disease_config import MODELS_DIR, model_files, disease_inputs, positive_class
+from scoring import LinearModel
+
+
+class ModelLoadError(Exception):
+    pass
+
+
+def _stamp(path):
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    if path.endswith(".npz"):
+        # An exported artifact also changes when the .sav it came from is replaced in place
+        try:
+            source = os.stat(os.path.splitext(path)[0] + ".sav")
+        except FileNotFoundError:
+            return stamp
+        stamp += (source.st_mtime_ns, source.st_size)
+    return stamp
+
+
+def _artifact_key(info):
+    return info["path"], info["stamp"]
+
+
+def _new_shadow_stats():
+    return {"requests": 0, "rows": 0, "disagreements": 0, "risk_delta_sum": 0.0, "max_risk_delta": 0.0,
+            "errors": 0}
+
+
+class ModelRegistry:
+    """Loads each disease model on first use and keeps one shared copy per process.
+
+    Artifacts may be versioned: ``<stem>.v<N>.npz`` (or ``.sav``) next to the
+    original ``<stem>.sav``, which counts as version 0. The highest version
+    present is used, and an exported .npz wins over the pickle of the same
+    version. ``refresh`` (run periodically by ``ModelWatcher``) swaps in new
+    artifacts without a restart; with ``shadow=True`` they are only scored
+    alongside the live model until ``promote`` is called.
+    """
+
+    def __init__(self, models_dir=MODELS_DIR, shadow=False):
+        self.models_dir = models_dir
+        self.shadow = shadow
+        self._models = {}
+        self._info = {}
+        self._shadows = {}
+        self._rejected = set()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+    def diseases(self):
+        return list(model_files.keys())
+
+    def get(self, disease):
+        model = self._models.get(disease)
+        if model is not None:
+            return model
+        with self._lock:
+            # Another session may have loaded it while we waited for the lock
+            if disease not in self._models:
+                self._models[disease] = self._load(disease)
+            return self._models[disease]
+
+    def info(self, disease):
+        self.get(disease)
+        return self._info[disease]
+
+    def score(self, disease, X):
+        """Score a batch of patients (one row each) for a disease.
+
+        Returns ``(labels, risk_percent)`` where label 1 means "at risk" and
+        the risk is the probability of the at-risk class, both from one pass.
+        """
+        # One lookup: a swap during the call does not mix two models
+        labels, risk = self._score(disease, self.get(disease), X)
+        shadow = self._shadows.get(disease)
+        if shadow is not None:
+            self._compare(shadow, disease, X, labels, risk)
+        return labels, risk
+
+    def explain(self, disease, X):
+        """``score`` plus per-feature contributions, one row per patient.
+
+        A contribution is coefficient × input value: how far that feature moved
+        the model's decision value (log-odds for the logistic models) towards
+        "at risk", or away from it when negative. The models are linear in the
+        raw inputs, so these are exact and come out of the scoring pass itself.
+        Returns ``(labels, risk_percent, contributions)``.
+        """
+        model = self.get(disease)
+        if isinstance(model, LinearModel):
+            classes, proba, contributions = model.explain(X)
+        else:
+            # Pickle fallback: only linear kernels expose coef_
+            coef = getattr(model, "coef_", None)
+            if coef is None:
+                raise ModelLoadError(f"{disease} model is not linear, so it cannot be explained")
+            X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+            contributions = X * np.asarray(coef, dtype=np.float64).ravel()
+            z = np.asarray(model.decision_function(X), dtype=np.float64)
+            classes = model.classes_[(z > 0).astype(np.intp)]
+            proba = 0.5 * (1.0 + np.tanh(0.5 * z))
+
+        labels, risk = self._orient(disease, model, classes, proba)
+        if positive_class[disease] != model.classes_[1]:
+            contributions = -contributions
+        shadow = self._shadows.get(disease)
+        if shadow is not None:
+            self._compare(shadow, disease, X, labels, risk)
+        return labels, risk, contributions
+
+    def _score(self, disease, model, X):
+        if isinstance(model, LinearModel):
+            classes, proba = model.score(X)
+        else:
+            # Pickle fallback: derive both outputs from a single decision_function call
+            z = np.asarray(model.decision_function(np.atleast_2d(X)), dtype=np.float64)
+            classes = model.classes_[(z > 0).astype(np.intp)]
+            proba = 0.5 * (1.0 + np.tanh(0.5 * z))
+        return self._orient(disease, model, classes, proba)
+
+    def _orient(self, disease, model, classes, proba):
+        positive = positive_class[disease]
+        labels = (classes == positive).astype(int)
+        if positive != model.classes_[1]:
+            proba = 1.0 - proba
+        return labels, proba * 100
+
+    def _compare(self, shadow, disease, X, labels, risk):
+        # A failing shadow is counted, never surfaced to the live prediction
+        try:
+            shadow_labels, shadow_risk = self._score(disease, shadow["model"], X)
+        except Exception:
+            with self._stats_lock:
+                shadow["stats"]["errors"] += 1
+            return
+        delta = np.abs(shadow_risk - risk)
+        with self._stats_lock:
+            stats = shadow["stats"]
+            stats["requests"] += 1
+            stats["rows"] += len(labels)
+            stats["disagreements"] += int(np.count_nonzero(shadow_labels != labels))
+            stats["risk_delta_sum"] += float(delta.sum())
+            stats["max_risk_delta"] = max(stats["max_risk_delta"], float(delta.max(initial=0.0)))
+
+    def shadow_stats(self):
+        """Per disease with a shadow model: both versions and how often they disagree."""
+        result = {}
+        with self._stats_lock:
+            for disease, shadow in list(self._shadows.items()):
+                stats = dict(shadow["stats"])
+                rows = stats.pop("rows")
+                risk_delta_sum = stats.pop("risk_delta_sum")
+                result[disease] = {
+                    "live_version": self._info[disease]["version"],
+                    "shadow_version": shadow["info"]["version"],
+                    "rows": rows,
+                    "disagreement_rate": stats["disagreements"] / rows if rows else 0.0,
+                    "mean_risk_delta": risk_delta_sum / rows if rows else 0.0,
+                    **stats,
+                }
+        return result
+
+    def promote(self, disease):
+        """Make the shadow model live; returns its info, or None when there is none."""
+        with self._lock:
+            shadow = self._shadows.pop(disease, None)
+            if shadow is None:
+                return None
+            self._install(disease, shadow["model"], shadow["info"])
+        return shadow["info"]
+
+    def refresh(self):
+        """Pick up new artifacts for the models in use; returns the diseases that changed.
+
+        A new artifact is loaded, checked against ``disease_inputs`` and scored
+        once before it replaces the live model (or, in shadow mode, becomes its
+        shadow), all without holding the lock that predictions use. Predictions
+        already running finish on the model they started with. An artifact that
+        fails the checks is skipped until the file changes again. Replacing the
+        .sav an .npz was exported from counts as a change of that .npz. When the live
+        artifact's file was deleted, the one that takes over is installed
+        directly, in shadow mode too (a rollback is not something to shadow).
+        """
+        changed = []
+        with self._refresh_lock:
+            for disease in self.loaded():
+                found = self._latest_artifact(disease)
+                if found is None:
+                    continue  # Files removed: keep serving what is loaded
+                version, path = found
+                try:
+                    key = (path, _stamp(path))
+                except OSError:
+                    continue
+                shadow = self._shadows.get(disease)
+                live_gone = not os.path.exists(self._info[disease]["path"])
+                if key == _artifact_key(self._info[disease]):
+                    if shadow is not None:
+                        # The shadow's artifact was withdrawn
+                        with self._lock:
+                            self._shadows.pop(disease, None)
+                        changed.append(disease)
+                    continue
+                if key in self._rejected:
+                    continue
+                if shadow is not None and key == _artifact_key(shadow["info"]):
+                    if live_gone:
+                        self.promote(disease)
+                        changed.append(disease)
+                    continue
+
+                try:
+                    model, info = self._load_artifact(disease, version, path)
+                    self._warm_up(disease, model)
+                except Exception as e:
+                    self._rejected.add(key)
+                    warnings.warn(f"Keeping the current {disease} model; {path} was rejected: {e}")
+                    continue
+                with self._lock:
+                    if self.shadow and not live_gone:
+                        self._shadows[disease] = {"model": model, "info": info, "stats": _new_shadow_stats()}
+                    else:
+                        self._install(disease, model, info)
+                        self._shadows.pop(disease, None)
+                changed.append(disease)
+        return changed
+
+    def _install(self, disease, model, info):
+        self._info[disease] = info
+        self._models[disease] = model
+
+    def _warm_up(self, disease, model):
+        # One test row before the swap: a broken artifact fails here rather than on a
+        # doctor's request, and the first real prediction pays no first-call cost
+        _, risk = self._score(disease, model, np.zeros((1, len(disease_inputs[disease]))))
+        if not np.all(np.isfinite(risk)):
+            raise ModelLoadError(f"{disease} model returned a non-finite risk")
+
+    def loaded(self):
+        return list(self._models.keys())
+
+    def _latest_artifact(self, disease):
+        """``(version, path)`` of the artifact to serve for a disease, or None."""
+        stem = os.path.splitext(model_files[disease])[0]
+        pattern = re.compile(rf"{re.escape(stem)}(?:\.v(\d+))?\.(npz|sav)")
+        try:
+            names = os.listdir(self.models_dir)
+        except FileNotFoundError:
+            return None
+        best = None
+        for name in names:
+            match = pattern.fullmatch(name)
+            if match:
+                rank = (int(match.group(1) or 0), match.group(2) == "npz")
+                if best is None or rank > best[0]:
+                    best = (rank, name)
+        if best is None:
+            return None
+        return best[0][0], os.path.join(self.models_dir, best[1])
+
+    def _load(self, disease):
+        if disease not in model_files:
+            raise ModelLoadError(f"Unknown disease: {disease}")
+        found = self._latest_artifact(disease)
+        if found is None:
+            raise ModelLoadError(f"Model file not found: {os.path.join(self.models_dir, model_files[disease])}")
+        model, self._info[disease] = self._load_artifact(disease, *found)
+        return model
+
+    def _load_artifact(self, disease, version, path):
+        stamp = _stamp(path)
+        with metrics.span("model_load"):
+            source_path = os.path.splitext(path)[0] + ".sav"
+            if path.endswith(".npz") and self._is_stale(path, source_path):
+                # The .sav was replaced without re-running export_models.py: serve what the operator
+                # put there, not the old export (needs scikit-learn; refused without it)
+                warnings.warn(f"{path} is stale; loading {source_path} instead. Re-run export_models.py")
+                model, info = self._load_pickle(disease, source_path)
+                info["path"] = path  # still the artifact in charge, so refresh compares against it
+            elif path.endswith(".npz"):
+                model, info = self._load_npz(disease, path)
+            else:
+                # No exported artifact yet: fall back to the pickle (needs scikit-learn)
+                model, info = self._load_pickle(disease, path)
+        info.update(version=version, stamp=stamp, loaded_at=time.time())
+        return model, info
+
+    @staticmethod
+    def _is_stale(npz_path, source_path):
+        """True when the .sav next to an exported artifact is not the one it was exported from."""
+        if not os.path.exists(source_path):
+            return False
+        try:
+            exported_from = LinearModel.from_npz(npz_path).metadata.get("source_sha256")
+        except Exception:
+            return False  # Reported by _load_npz
+        with open(source_path, "rb") as f:
+            return bool(exported_from) and hashlib.sha256(f.read()).hexdigest() != exported_from
+
+    def _load_npz(self, disease, npz_path):
+        try:
+            model = LinearModel.from_npz(npz_path)
+        except Exception as e:
+            raise ModelLoadError(f"Could not load {npz_path}: {e}") from e
+        self._check_features(disease, model)
+
+        with open(npz_path, "rb") as f:
+            sha256 = hashlib.sha256(f.read()).hexdigest()
+        return model, {
+            "path": npz_path,
+            "sha256": sha256,
+            "n_features": model.n_features_in_,
+            "sklearn_version": model.metadata.get("sklearn_version"),
+        }
+
+    def _load_pickle(self, disease, path):
+        if not os.path.exists(path):
+            raise ModelLoadError(f"Model file not found: {path}")
+
+        with open(path, "rb") as f:
+            raw = f.read()
+        sha256 = hashlib.sha256(raw).hexdigest()
+        try:
+            model = pickle.loads(raw)
+        except Exception as e:
+            raise ModelLoadError(f"Could not unpickle {path}: {e}") from e
+
+        # Integrity checks, done once per process instead of on every rerun
+        self._check_features(disease, model)
+        if not hasattr(model, "predict"):
+            raise ModelLoadError(f"{disease} model does not implement predict()")
+
+        trained_version = getattr(model, "_sklearn_version", None)
+        installed_version = None
+        try:
+            import sklearn
+            installed_version = sklearn.__version__
+        except ImportError:
+            pass
+        if trained_version and installed_version and trained_version != installed_version:
+            warnings.warn(
+                f"{disease} model was trained with scikit-learn {trained_version}, "
+                f"running with {installed_version}"
+            )
+
+        return model, {
+            "path": path,
+            "sha256": sha256,
+            "n_features": len(disease_inputs[disease]),
+            "sklearn_version": trained_version,
+        }
+
+    def _check_features(self, disease, model):
+        expected = len(disease_inputs[disease])
+        n_features = getattr(model, "n_features_in_", None)
+        if n_features is not None and n_features != expected:
+            raise ModelLoadError(
+                f"{disease} model expects {n_features} features but {expected} inputs are configured"
+            )
+
+
+class ModelWatcher:
+    """Calls ``registry.refresh()`` every ``interval`` seconds on a daemon thread."""
+
+    def __init__(self, registry, interval=30.0):
+        self.registry = registry
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.registry.refresh()
+            except Exception as e:
+                warnings.warn(f"Model refresh failed: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+
+def registry_from_env():
+    """Registry that reloads new artifacts every MODEL_RELOAD_SECONDS (0 turns it off);
+    MODEL_SHADOW=1 scores them in shadow until promoted."""
+    registry = ModelRegistry(shadow=os.getenv("MODEL_SHADOW", "0") == "1")
+    interval = float(os.getenv("MODEL_RELOAD_SECONDS", "30"))
+    if interval > 0:
+        ModelWatcher(registry, interval)
+    return registry
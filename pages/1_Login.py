@@ -1,17 +1,9 @@
 import streamlit as st
-from pymongo import MongoClient
-from werkzeug.security import generate_password_hash, check_password_hash
 import os
 import re
-from dotenv import load_dotenv
 import time
-
-# Load MongoDB connection
-load_dotenv()
-mongo_uri = os.getenv("MONGO_URI")
-client = MongoClient(mongo_uri)
-db = client["disease_predictor"]
-users_collection = db["users"]
+import metrics
+from auth_utils import issue_session_token, login_user, register_user, session_is_valid, validate_session_token
 
 # Utility validators
 def is_valid_email(email):
@@ -22,38 +14,32 @@ def is_strong_password(password):
 
 # User functions
 def signup(email, password, doctor_id, org_id):
-    if users_collection.find_one({"email": email}):
-        st.error("Email already registered.")
-        return False
-    if users_collection.find_one({"doctor_id": doctor_id}):
-        st.error("Doctor ID already in use.")
+    # One insert; the unique indexes on email, doctor_id and organization_id reject duplicates
+    with metrics.span("signup"):
+        ok, message = register_user(email, password, doctor_id, org_id)
+    if not ok:
+        st.error(message)
         return False
-    if users_collection.find_one({"organization_id": org_id}):
-        st.error("Organization ID already in use.")
-        return False
-
-    hashed_password = generate_password_hash(password)
-    users_collection.insert_one({
-        "email": email,
-        "password": hashed_password,
-        "doctor_id": doctor_id,
-        "organization_id": org_id
-    })
-    st.success("Signup successful! Please login.")
+    st.success(message)
     return True
 
 def login(email, password):
-    user = users_collection.find_one({"email": email})
-    if user and check_password_hash(user["password"], password):
-        st.session_state["authenticated"] = True
-        st.session_state["email"] = email
-        st.session_state["doctor_id"] = user.get("doctor_id", "")
-        return True
-    return False
+    # Hash check runs on the shared auth executor; failures are rate limited per account
+    with metrics.span("login"):
+        ok, result = login_user(email, password)
+    if not ok:
+        st.error(f"❌ {result}")
+        return False
+    st.session_state["authenticated"] = True
+    st.session_state["email"] = email
+    st.session_state["doctor_id"] = validate_session_token(result)["doctor_id"]
+    st.session_state["auth_token"] = result
+    return True
 
 # Main app
 def main():
     st.set_page_config(page_title="Sumit HealthCare Login", layout="centered")
+    metrics.serve_from_env()
 
     st.markdown("""
         <div style='text-align: center;'>
@@ -67,7 +53,7 @@ def main():
     if "authenticated" not in st.session_state:
         st.session_state.authenticated = False
 
-    if not st.session_state.authenticated:
+    if not session_is_valid(st.session_state):
         with st.container():
             auth_mode = st.radio("🔐 Choose Action", ["Login", "Signup"], horizontal=True)
 
@@ -90,6 +76,7 @@ def main():
                             st.session_state.authenticated = True
                             st.session_state.email = email
                             st.session_state.doctor_id = doctor_id
+                            st.session_state.auth_token = issue_session_token(email, doctor_id)
                             st.rerun()
 
             else:
@@ -104,13 +91,11 @@ def main():
                         st.error("❗ Please enter a valid email address.")
                     elif login(email, password):
                         st.rerun()
-                    else:
-                        st.error("❌ Invalid email or password")
 
     else:
         st.success(f"Welcome Doctor!")
         with st.spinner("🔁 Redirecting to the Predictor..."):
-            time.sleep(2)
+            time.sleep(float(os.getenv("LOGIN_REDIRECT_SECONDS", "2")))
             st.switch_page("pages/2_Predictor.py")
 
 if __name__ == "__main__":
@@ -1,216 +1,340 @@
 import streamlit as st
-import pickle
-import numpy as np
+import math
 import os
-from fpdf import FPDF
-from datetime import datetime
-import matplotlib.pyplot as plt
-import plotly.graph_objects as go
-from scipy.special import expit  # sigmoid function
-import tempfile
-
-# Ensure reports folder exists
-os.makedirs("reports", exist_ok=True)
-
-# Load ML models
-models = {
-    'Diabetes': pickle.load(open('models/diabetes_model.sav', 'rb')),
-    'Heart Disease': pickle.load(open('models/heart_disease_model.sav', 'rb')),
-    "Parkinson's": pickle.load(open('models/parkinsons_model.sav', 'rb')),
-    'Breast Cancer': pickle.load(open('models/breast_cancer_model.sav', 'rb'))
-}
+import re
+import metrics
+from auth_utils import end_session, session_is_valid
+from disease_config import disease_inputs
+from prediction_cache import LRUCache, prediction_key, report_key
+
+# NumPy, the model registry, charting (matplotlib/plotly), batch screening and the
+# report pool are imported where they are first needed, so visitors who are not
+# logged in (and reruns before Predict) never pay for them. Checked by
+# benchmarks/import_budget.py.
+
+
+# Load ML models lazily, once per server process (shared across sessions); new model
+# versions dropped into models/ are swapped in without a restart (MODEL_RELOAD_SECONDS)
+@st.cache_resource
+def get_model_registry():
+    from model_registry import registry_from_env
+    return registry_from_env()
+
+
+# Report generation runs on a shared pool of reusable worker processes
+@st.cache_resource
+def get_report_pool():
+    from report_jobs import ReportWorkerPool
+    return ReportWorkerPool(
+        max_workers=int(os.getenv("REPORT_WORKERS", "2")),
+        max_pending=int(os.getenv("REPORT_QUEUE_SIZE", "32"))
+    )
+
+
+# Predictions and their page charts, shared by all sessions (PREDICTION_CACHE_SIZE entries)
+@st.cache_resource
+def get_prediction_cache():
+    return LRUCache(int(os.getenv("PREDICTION_CACHE_SIZE", "128")))
+
+
+# Report job per submission, so an identical submission reuses the PDF instead of queueing another
+@st.cache_resource
+def get_report_jobs():
+    return LRUCache(int(os.getenv("REPORT_CACHE_SIZE", "128")))
+
+
+# Audit trail of predictions, written to MongoDB by a background thread (None when disabled)
+@st.cache_resource
+def get_audit_log():
+    from audit_log import get_audit_writer
+    return get_audit_writer()
+
+
+def audit(make_record, *args, **kwargs):
+    # Only queues the record; the page never waits on the database
+    audit_log = get_audit_log()
+    if audit_log is not None:
+        audit_log.record(make_record(st.session_state.get('doctor_id'), st.session_state.get('email'), *args, **kwargs))
+
+
+def chunk_auditor(disease, file_name, model_version):
+    """Per-chunk callback for screen_file that queues a prediction record for every scored row."""
+    audit_log = get_audit_log()
+    if audit_log is None:
+        return None
+    from audit_log import prediction_record
+    from batch_screening import scored_rows
+
+    doctor_id, doctor_email = st.session_state.get('doctor_id'), st.session_state.get('email')
+
+    def audit_chunk(result, first_row):
+        # Waits for queue room if needed (screening is not latency-critical) rather than spilling to disk
+        audit_log.record_many([
+            prediction_record(doctor_id, doctor_email, disease, inputs, label, risk, source="batch_screening",
+                              file_name=file_name, row=row, model_version=model_version)
+            for row, inputs, label, risk in scored_rows(disease, result, first_row)
+        ])
+    return audit_chunk
+
+
+def queue_report(submission, **report_kwargs):
+    pool = get_report_pool()
+    jobs = get_report_jobs()
+    job_id = jobs.get(submission)
+    if job_id is not None and pool.status(job_id) in ("queued", "running", "done"):
+        return job_id
+    job_id = pool.submit(**report_kwargs)
+    jobs.put(submission, job_id)
+    return job_id
+
+
+def input_key(disease, field):
+    return f"input:{disease}:{field}"
+
+
+def parse_pasted_row(text, disease):
+    """Values of one pasted row (e.g. copied from a spreadsheet), in ``disease_inputs`` order."""
+    fields = disease_inputs[disease]
+    parts = [part.strip() for part in re.split(r"[,\t]", text.strip())]
+    if parts and parts[-1] == "":
+        parts.pop()  # trailing separator
+    if len(parts) != len(fields):
+        raise ValueError(f"Expected {len(fields)} values for {disease}, got {len(parts)}.")
+    values = []
+    for field, part in zip(fields, parts):
+        try:
+            value = float(part)
+        except ValueError:
+            raise ValueError(f"'{part}' is not a number ({field}).") from None
+        if not math.isfinite(value):
+            raise ValueError(f"{field} must be a finite number.")
+        values.append(value)
+    return values
+
+
+def apply_pasted_row(disease):
+    # Runs before the rerun, so the pasted values fill the fields and are predicted on at once
+    st.session_state[f"paste_failed:{disease}"] = False
+    text = st.session_state.get(f"paste:{disease}", "").strip()
+    if not text:
+        return
+    try:
+        values = parse_pasted_row(text, disease)
+    except ValueError as e:
+        st.session_state[f"paste_error:{disease}"] = str(e)
+        st.session_state[f"paste_failed:{disease}"] = True
+        return
+    for field, value in zip(disease_inputs[disease], values):
+        st.session_state[input_key(disease, field)] = value
+    st.session_state[f"paste:{disease}"] = ""
+
+
+def predict(registry, disease, inputs):
+    """Score one patient and render the page charts; the result is memoized, so it holds only data."""
+    import io
+    import numpy as np
+    import plotly.graph_objects as go
+    from report_charts import render_contributions, render_input_bars
+
+    with metrics.span("predict"):
+        labels, risks, contributions = registry.explain(disease, np.array(list(inputs.values())).reshape(1, -1))
+    prediction = int(labels[0])
+    risk_percent = float(risks[0])
+    contributions = dict(zip(inputs.keys(), contributions[0].tolist()))
+
+    # Risk gauge (the PDF copy is rendered by the report worker)
+    with metrics.span("gauge"):
+        fig_gauge = go.Figure(go.Indicator(
+            mode="gauge+number",
+            value=risk_percent,
+            domain={'x': [0, 1], 'y': [0, 1]},
+            title={'text': f"{disease} Risk Probability (%)"},
+            gauge={
+                'axis': {'range': [0, 100]},
+                'bar': {'color': "crimson"},
+                'steps': [
+                    {'range': [0, 40], 'color': "lightgreen"},
+                    {'range': [40, 70], 'color': "yellow"},
+                    {'range': [70, 100], 'color': "red"}
+                ],
+                'threshold': {
+                    'line': {'color': "black", 'width': 4},
+                    'thickness': 0.75,
+                    'value': risk_percent
+                }
+            }
+        ))
+
+    # Input parameters bar chart, kept as PNG bytes: only the bars of the disease's chart are redrawn
+    with metrics.span("bar_chart"):
+        bar_png = render_input_bars(inputs, disease, io.BytesIO(), dpi=200)
+
+    with metrics.span("contributions_chart"):
+        contributions_png = render_contributions(contributions, disease, io.BytesIO(), dpi=200)
+
+    return {
+        "prediction": prediction,
+        "risk_percent": risk_percent,
+        "contributions": contributions,
+        "gauge": fig_gauge.to_dict(),
+        "bar_chart": bar_png.getvalue(),
+        "contributions_chart": contributions_png.getvalue(),
+    }
+
+
+def show_prediction(disease, result):
+    if result["prediction"] == 1:
+        st.error(f"⚠ {disease} Prediction: Positive (At Risk)")
+    else:
+        st.success(f"✅ {disease} Prediction: Negative (Not At Risk)")
+
+    st.subheader("📈 Risk Probability Gauge")
+    st.plotly_chart(result["gauge"], use_container_width=True)
+
+    st.subheader("🧭 What Drove This Prediction")
+    st.image(result["contributions_chart"], use_container_width=True)
+    st.caption("Red bars pushed this patient towards \"at risk\", green bars away from it. "
+               "Each bar is the model's coefficient for that input times the value entered.")
+
+    st.subheader("📊 Input Parameters Visualization")
+    st.image(result["bar_chart"], use_container_width=True)
+
+
+# Where workers save reports (None unless REPORT_STORE / REPORT_STORE_DIR is set);
+# the retention sweeper runs once per server process
+@st.cache_resource
+def get_report_store():
+    from report_store import RetentionSweeper, report_store_from_env
+    store = report_store_from_env()
+    if store is not None:
+        RetentionSweeper(store, interval=float(os.getenv("REPORT_STORE_SWEEP_SECONDS", "3600")))
+    return store
+
+
+def load_report(report):
+    # Read from the store once per session, not on every rerun of the page
+    if report["data"] is not None:
+        return report["data"]
+    cached = st.session_state.get("report_bytes")
+    if cached is None or cached[0] != report["report_id"]:
+        cached = (report["report_id"], get_report_store().read(report["report_id"]))
+        st.session_state["report_bytes"] = cached
+    return cached[1]
+
+
+@st.fragment(run_every=1)
+def report_progress(job_id):
+    # Only this fragment reruns while polling, so the results above stay on screen
+    if get_report_pool().status(job_id) in ("queued", "running"):
+        st.info("📄 Preparing the detailed medical report...")
+    else:
+        # Finished: one full rerun renders the download below and stops the polling
+        st.rerun()
+
+
+def report_download(job_id):
+    pool = get_report_pool()
+    status = pool.status(job_id)
+    if status in ("queued", "running"):
+        report_progress(job_id)
+    elif status == "done":
+        from report_store import ReportNotFound
+
+        report = pool.result(job_id)
+        try:
+            report_bytes = load_report(report)
+        except ReportNotFound:
+            st.warning("This report is no longer available. Please run the prediction again.")
+            return
+        st.download_button("📄 Download Detailed Medical Report (PDF)", report_bytes,
+                           file_name=report["file_name"],
+                           mime="application/pdf",
+                           on_click="ignore")
+        from auth_utils import has_shared_secret, issue_report_link
+
+        link_base = os.getenv("REPORT_LINK_BASE_URL")
+        if link_base and report["report_id"] and has_shared_secret():
+            # Signed, expiring link served by prediction_service.py --serve-reports on any replica
+            st.link_button("🔗 Direct download link",
+                           f"{link_base.rstrip('/')}/reports/{issue_report_link(report['report_id'])}")
+    elif status == "failed":
+        st.error(f"Report generation failed: {pool.error(job_id)}")
+    else:
+        st.warning("This report is no longer available. Please run the prediction again.")
+
+
+def shadow_models_panel(email):
+    """Shadow model disagreement and promotion, for accounts listed in ADMIN_EMAILS (MODEL_SHADOW=1)."""
+    if os.getenv("MODEL_SHADOW", "0") != "1" or not metrics.is_admin(email):
+        return
+    registry = get_model_registry()
+    shadows = registry.shadow_stats()
+    if not shadows:
+        return
+    with st.sidebar.expander("🧪 Shadow models"):
+        for disease, stats in shadows.items():
+            st.markdown(f"**{disease}**: v{stats['live_version']} live, v{stats['shadow_version']} in shadow")
+            st.caption(f"{stats['rows']} patients scored, {stats['disagreement_rate']:.1%} disagree, "
+                       f"risk differs by {stats['mean_risk_delta']:.2f} pts on average "
+                       f"(max {stats['max_risk_delta']:.2f}), {stats['errors']} errors")
+            if st.button(f"Promote v{stats['shadow_version']}", key=f"promote:{disease}"):
+                registry.promote(disease)
+                st.rerun()
+
 
 # Logout button in sidebar
 with st.sidebar:
     st.title("Sumit HealthCare 🏥")
     st.markdown("---")
 
-    if st.session_state.get("authenticated", False):
+    if session_is_valid(st.session_state):
         st.success(f"Logged in as *{st.session_state.get('email', '')}*")
         if st.button("🚪 Logout"):
-            st.session_state.authenticated = False
-            st.session_state.email = None
-            st.session_state.doctor_id = None
+            end_session(st.session_state)
             st.success("You have been logged out.")
             st.rerun()
+        metrics.admin_panel(st.session_state.get("email"))
+        shadow_models_panel(st.session_state.get("email"))
     else:
         st.info("🔐 Please log in to access the app features.")
 
-disease_inputs = {
-    'Diabetes': [
-        'Number of Pregnancies', 'Glucose Level', 'Blood Pressure',
-        'Skin Thickness', 'Insulin Level', 'BMI',
-        'Diabetes Pedigree Function', 'Age'
-    ],
-    'Heart Disease': [
-        'Age', 'Sex (1=Male, 0=Female)', 'Chest Pain types',
-        'Resting Blood Pressure', 'Serum Cholestoral in mg/dl',
-        'Fasting Blood Sugar > 120 mg/dl (1 = true; 0 = false)',
-        'Resting Electrocardiographic results (0,1,2)',
-        'Maximum Heart Rate achieved', 'Exercise Induced Angina (1 = yes; 0 = no)',
-        'ST depression', 'Slope of the peak exercise ST segment',
-        'Number of major vessels (0-3)', 'Thal (1 = normal; 2 = fixed defect; 3 = reversable defect)'
-    ],
-    "Parkinson's": [
-        'MDVP:Fo(Hz)', 'MDVP:Fhi(Hz)', 'MDVP:Flo(Hz)', 'MDVP:Jitter(%)',
-        'MDVP:Jitter(Abs)', 'MDVP:RAP', 'MDVP:PPQ', 'Jitter:DDP',
-        'MDVP:Shimmer', 'MDVP:Shimmer(dB)', 'Shimmer:APQ3', 'Shimmer:APQ5',
-        'MDVP:APQ', 'Shimmer:DDA', 'NHR', 'HNR', 'RPDE', 'DFA',
-        'spread1', 'spread2', 'D2', 'PPE'
-    ],
-    'Breast Cancer': [
-        'Mean Radius', 'Mean Texture', 'Mean Perimeter', 'Mean Area',
-        'Mean Smoothness', 'Mean Compactness', 'Mean Concavity',
-        'Mean Concave Points', 'Mean Symmetry', 'Mean Fractal Dimension',
-        'SE Radius', 'SE Texture', 'SE Perimeter', 'SE Area',
-        'SE Smoothness', 'SE Compactness', 'SE Concavity',
-        'SE Concave Points', 'SE Symmetry', 'SE Fractal Dimension',
-        'Worst Radius', 'Worst Texture', 'Worst Perimeter', 'Worst Area',
-        'Worst Smoothness', 'Worst Compactness', 'Worst Concavity',
-        'Worst Concave Points', 'Worst Symmetry', 'Worst Fractal Dimension'
-    ]
-}
-
-detailed_recommendations = {
-    'Diabetes': {
-        1: """Positive Diagnosis - At Risk:
-- Maintain strict blood glucose monitoring.
-- Follow a diabetes-friendly diet rich in fiber, vegetables, and lean proteins.
-- Engage in regular physical activity (at least 30 minutes daily).
-- Avoid sugary foods and beverages.
-- Schedule regular check-ups with your healthcare provider.
-- Consider medication adherence and insulin therapy if prescribed.
-- Monitor for symptoms like excessive thirst, frequent urination, and fatigue.
-""",
-        0: """Negative Diagnosis - Not At Risk:
-- Maintain a balanced diet and healthy lifestyle to prevent diabetes.
-- Continue regular physical activity.
-- Monitor blood sugar levels periodically.
-- Stay informed about risk factors such as family history or weight changes.
-- Schedule routine health screenings.
-"""
-    },
-    'Heart Disease': {
-        1: """Positive Diagnosis - At Risk:
-- Follow a heart-healthy diet low in saturated fats, cholesterol, and sodium.
-- Control blood pressure and cholesterol levels with medication if prescribed.
-- Avoid tobacco and limit alcohol consumption.
-- Engage in moderate exercise as advised by your cardiologist.
-- Manage stress through relaxation techniques or counseling.
-- Monitor symptoms such as chest pain, shortness of breath, or palpitations.
-- Regular cardiology follow-ups and diagnostic tests are recommended.
-""",
-        0: """Negative Diagnosis - Not At Risk:
-- Maintain a balanced diet and regular exercise routine.
-- Avoid smoking and limit alcohol intake.
-- Monitor blood pressure and cholesterol levels periodically.
-- Manage stress and maintain a healthy weight.
-- Schedule regular cardiovascular health check-ups.
-"""
-    },
-    "Parkinson's": {
-        1: """Positive Diagnosis - At Risk:
-- Consult a neurologist promptly for detailed assessment.
-- Discuss medication options that can help manage symptoms.
-- Engage in physical therapy to improve mobility and balance.
-- Consider occupational therapy for daily activity support.
-- Monitor symptoms progression and report any changes immediately.
-- Maintain a supportive social and family environment.
-""",
-        0: """Negative Diagnosis - Not At Risk:
-- Maintain an active lifestyle with regular exercise.
-- Stay mentally engaged with activities like puzzles or reading.
-- Avoid exposure to toxins and harmful chemicals.
-- Monitor for any new or worsening symptoms.
-- Schedule routine neurological check-ups if risk factors exist.
-"""
-    },
-    'Breast Cancer': {
-        1: """Positive Diagnosis - At Risk:
-- Schedule an appointment with an oncologist immediately.
-- Follow through with recommended diagnostic tests (biopsy, imaging).
-- Discuss treatment options including surgery, chemotherapy, or radiation.
-- Maintain emotional and psychological support via counseling or support groups.
-- Inform family members about genetic risk factors if applicable.
-- Follow up regularly and adhere to prescribed treatment plans.
-""",
-        0: """Negative Diagnosis - Not At Risk:
-- Perform regular breast self-examinations.
-- Schedule routine mammograms and screenings as per guidelines.
-- Maintain a healthy diet and exercise regularly.
-- Avoid known carcinogens such as tobacco and excessive alcohol.
-- Stay vigilant for any changes or lumps and consult a doctor promptly.
-"""
-    }
-}
-
-def generate_pdf_report(patient_name, age, sex, doctor_email, doctor_id, org_id, disease, input_data, prediction, recommendation,
-                        risk_image_path=None, inputbar_image_path=None):
-    safe_patient_name = patient_name.replace(" ", "_") if patient_name else "UnknownPatient"
-    report_file = f"reports/{safe_patient_name}Medical_Report{datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
-
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", 'B', 18)
-    pdf.cell(0, 12, "Sumit HealthCare Services", ln=True, align='C')
-    pdf.set_font("Arial", '', 12)
-    pdf.cell(0, 8, "456 Wellness Ave, MedCity, Australia | +61-987-654-321", ln=True, align='C')
-    pdf.cell(0, 8, f"Report Generated: {datetime.now().strftime('%d-%m-%Y %H:%M')}", ln=True, align='C')
-    pdf.ln(12)
-
-    pdf.set_font("Arial", 'B', 14)
-    pdf.cell(0, 10, "Patient & Doctor Information", ln=True)
-    pdf.set_font("Arial", '', 12)
-    pdf.cell(0, 8, f"Patient Name: {patient_name}", ln=True)
-    pdf.cell(0, 8, f"Age: {age}   Sex: {sex}", ln=True)
-    pdf.cell(0, 8, f"Doctor Email: {doctor_email}", ln=True)
-    pdf.cell(0, 8, f"Doctor ID: {doctor_id}", ln=True)
-    pdf.cell(0, 8, f"Organization ID: {org_id}", ln=True)
-    pdf.ln(8)
-
-    pdf.set_font("Arial", 'B', 14)
-    pdf.cell(0, 10, f"Disease Predicted: {disease}", ln=True)
-    pdf.set_font("Arial", '', 12)
-    result_text = "Positive (At Risk)" if prediction == 1 else "Negative (Not At Risk)"
-    pdf.cell(0, 8, f"Prediction Result: {result_text}", ln=True)
-    pdf.ln(8)
-
-    # Add Risk Gauge Image if available
-    if risk_image_path and os.path.exists(risk_image_path):
-        pdf.set_font("Arial", 'B', 14)
-        pdf.cell(0, 10, "Risk Probability Gauge:", ln=True)
-        pdf.image(risk_image_path, w=160)
-        pdf.ln(10)
-
-    pdf.set_font("Arial", 'B', 14)
-    pdf.cell(0, 10, "Input Parameters:", ln=True)
-
-    # Add Input Bar Chart Image if available
-    if inputbar_image_path and os.path.exists(inputbar_image_path):
-        pdf.image(inputbar_image_path, w=160)
-        pdf.ln(10)
-    else:
-        pdf.set_font("Arial", '', 11)
-        for key, value in input_data.items():
-            pdf.cell(0, 7, f"{key}: {value}", ln=True)
-        pdf.ln(8)
+metrics.serve_from_env()
+
 
-    pdf.set_font("Arial", 'B', 14)
-    pdf.cell(0, 10, "Medical Recommendation:", ln=True)
-    pdf.set_font("Arial", '', 12)
-    pdf.multi_cell(0, 8, recommendation)
-    pdf.ln(12)
+def bulk_screening(registry, disease):
+    from batch_screening import ScreeningError, screen_file
 
-    pdf.set_font("Arial", 'I', 9)
-    pdf.set_text_color(100, 100, 100)
-    pdf.multi_cell(0, 6, "This is an AI-generated report. Please consult a qualified medical professional for diagnosis and treatment.", align='C')
+    st.subheader(f"📂 Bulk {disease} screening")
+    st.caption("Upload a CSV or Parquet file with one patient per row and these columns: "
+               + ", ".join(disease_inputs[disease]))
+    uploaded = st.file_uploader("Patient roster", type=["csv", "parquet"])
 
-    pdf.output(report_file)
-    return report_file
+    if uploaded is not None and st.button("Screen File"):
+        try:
+            with st.spinner("Scoring patients..."), metrics.span("batch_screening"):
+                model_version = registry.info(disease)["sha256"]
+                results, summary = screen_file(registry, disease, uploaded, uploaded.name,
+                                               on_chunk=chunk_auditor(disease, uploaded.name, model_version))
+        except ScreeningError as e:
+            st.error(f"❗ {e}")
+            st.stop()
+
+        from audit_log import screening_record
+        audit(screening_record, disease, uploaded.name, summary)
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Patients scored", summary["scored"])
+        col2.metric("Positive (At Risk)", summary["positive"])
+        col3.metric("Invalid rows", summary["invalid"])
+
+        base_name = os.path.splitext(uploaded.name)[0]
+        st.download_button("📥 Download Screening Results (CSV)", results,
+                           file_name=f"{base_name}_{disease.replace(' ', '_')}_results.csv",
+                           mime="text/csv")
 
 
 def main():
-    if not st.session_state.get("authenticated"):
+    if not session_is_valid(st.session_state):
         st.warning("Please log in to access the predictor.")
         st.stop()
 
@@ -221,142 +345,93 @@ def main():
         patient_age = st.number_input("Patient Age", min_value=1, max_value=120)
         patient_sex = st.selectbox("Patient Sex", ["Male", "Female", "Other"])
 
-    disease = st.selectbox("Select Disease to Predict", list(models.keys()))
+    registry = get_model_registry()
+    disease = st.selectbox("Select Disease to Predict", registry.diseases())
     input_fields = disease_inputs[disease]
 
-    st.subheader(f"🧪 Enter details for {disease} prediction")
-    inputs = {}
-    for field in input_fields:
-        value = st.number_input(field, step=0.0001, format="%.6f")
-        inputs[field] = value
+    mode = st.radio("Input Mode", ["Single Patient", "Bulk Screening (CSV/Parquet)"], horizontal=True)
+    if mode != "Single Patient":
+        bulk_screening(registry, disease)
+        return
 
-    if st.button("Predict"):
+    st.subheader(f"🧪 Enter details for {disease} prediction")
+    # One form: editing fields does not rerun the page, only pressing Predict does
+    with st.form(f"inputs:{disease}"):
+        st.text_input(
+            "Paste a row (optional)",
+            key=f"paste:{disease}",
+            placeholder=f"{len(input_fields)} values, comma- or tab-separated, in the order below",
+        )
+        paste_error = st.session_state.pop(f"paste_error:{disease}", None)
+        if paste_error:
+            st.error(f"❗ {paste_error}")
+        inputs = {}
+        for field in input_fields:
+            inputs[field] = st.number_input(field, step=0.0001, format="%.6f", key=input_key(disease, field))
+        predict_clicked = st.form_submit_button("Predict", on_click=apply_pasted_row, args=(disease,))
+
+    submission = report_key(
+        disease, inputs.values(),
+        patient_name=patient_name,
+        age=patient_age,
+        sex=patient_sex,
+        doctor_email=st.session_state.get('email', 'unknown@example.com'),
+        doctor_id=st.session_state.get('doctor_id', 'UnknownID'),
+    )
+
+    if predict_clicked and not st.session_state.get(f"paste_failed:{disease}"):
         if not patient_name:
             st.error("Please enter the patient's name.")
             st.stop()
 
-        input_array = np.array(list(inputs.values())).reshape(1, -1)
-        model = models[disease]
-        prediction = model.predict(input_array)[0]
-
-        risk_percent = None
-        prob_error = False
+        predictions = get_prediction_cache()
+        try:
+            model_version = registry.info(disease)["sha256"]
+            key = prediction_key(disease, inputs.values(), model_version)
+            result = predictions.get(key)
+            if result is None:
+                result = predict(registry, disease, inputs)
+                predictions.put(key, result)
+        except Exception as e:
+            st.error(f"Prediction failed: {e}")
+            st.stop()
+        from audit_log import prediction_record
+        audit(prediction_record, disease, inputs, result["prediction"], result["risk_percent"],
+              patient_name=patient_name, patient_age=patient_age, patient_sex=patient_sex,
+              model_version=model_version)
 
-        if disease == 'Breast Cancer':
-            prediction = 1 - prediction  # This will flip 0 to 1 and 1 to 0
+        from report_jobs import ReportQueueFull
 
+        job_id, report_error = None, None
         try:
-            if hasattr(model, "predict_proba"):
-                probs = model.predict_proba(input_array)
-                if disease == 'Breast Cancer':
-                    risk_percent = probs[0][0] * 100
-                else:
-                    risk_percent = probs[0][1] * 100
-            elif hasattr(model, "decision_function"):
-                dec_score = model.decision_function(input_array)[0]
-                risk_prob = expit(dec_score)  # sigmoid
-                if disease == 'Breast Cancer':
-                    risk_percent = (1 - risk_prob) * 100
-                else:
-                    risk_percent = risk_prob * 100
-        except Exception:
-            prob_error = True
-
-        if prediction == 1:
-            st.error(f"⚠ {disease} Prediction: Positive (At Risk)")
-        else:
-            st.success(f"✅ {disease} Prediction: Negative (Not At Risk)")
-
-        # Show risk gauge chart if available and save it to temp
-        risk_image_path = None
-        if risk_percent is not None:
-            st.subheader("📈 Risk Probability Gauge")
-            fig_gauge = go.Figure(go.Indicator(
-                mode="gauge+number",
-                value=risk_percent,
-                domain={'x': [0, 1], 'y': [0, 1]},
-                title={'text': f"{disease} Risk Probability (%)"},
-                gauge={
-                    'axis': {'range': [0, 100]},
-                    'bar': {'color': "crimson"},
-                    'steps': [
-                        {'range': [0, 40], 'color': "lightgreen"},
-                        {'range': [40, 70], 'color': "yellow"},
-                        {'range': [70, 100], 'color': "red"}
-                    ],
-                    'threshold': {
-                        'line': {'color': "black", 'width': 4},
-                        'thickness': 0.75,
-                        'value': risk_percent
-                    }
-                }
-            ))
-            st.plotly_chart(fig_gauge, use_container_width=True)
-
-            # Save gauge chart as PNG image for PDF
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmpfile:
-                risk_image_path = tmpfile.name
-                fig_gauge.write_image(risk_image_path, scale=2)
+            job_id = queue_report(
+                (model_version,) + submission,  # a new model version gets a new report
+                patient_name=patient_name,
+                age=patient_age,
+                sex=patient_sex,
+                doctor_email=st.session_state.get('email', 'unknown@example.com'),
+                doctor_id=st.session_state.get('doctor_id', 'UnknownID'),
+                org_id="HealthCare-001",
+                disease=disease,
+                input_data=inputs,
+                prediction=result["prediction"],
+                risk_percent=result["risk_percent"],
+                contributions=result["contributions"]
+            )
+        except ReportQueueFull as e:
+            report_error = str(e)
+        st.session_state.last_prediction = {
+            "submission": submission, "result": result, "job_id": job_id, "report_error": report_error
+        }
+
+    # Shown on every rerun (e.g. after the download) until an input or the patient changes
+    last = st.session_state.get("last_prediction")
+    if last is not None and last["submission"] == submission:
+        show_prediction(disease, last["result"])
+        if last["job_id"] is not None:
+            report_download(last["job_id"])
         else:
-            if prob_error:
-                st.warning("Risk probability gauge could not be generated due to model limitations or error.")
-            else:
-                st.info("Risk probability data not available for this model.")
-
-        recommendation = detailed_recommendations[disease][prediction]
-
-        # Generate input parameters bar chart and save image for PDF
-        st.subheader("📊 Input Parameters Visualization")
-        fig_bar, ax = plt.subplots(figsize=(8, max(4, len(inputs) * 0.3)))
-        ax.barh(list(inputs.keys()), list(inputs.values()), color='skyblue')
-        ax.set_xlabel('Values')
-        ax.set_title(f'Input Parameters for {disease} Prediction')
-        plt.tight_layout()
-        st.pyplot(fig_bar)
-
-        inputbar_image_path = None
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmpfile:
-            inputbar_image_path = tmpfile.name
-            fig_bar.savefig(inputbar_image_path, bbox_inches='tight')
-            plt.close(fig_bar)  # Close figure to free memory
-
-        # Generate PDF report with embedded images
-        report_path = generate_pdf_report(
-            patient_name=patient_name,
-            age=patient_age,
-            sex=patient_sex,
-            doctor_email=st.session_state.get('email', 'unknown@example.com'),
-            doctor_id=st.session_state.get('doctor_id', 'UnknownID'),
-            org_id="HealthCare-001",
-            disease=disease,
-            input_data=inputs,
-            prediction=prediction,
-            recommendation=recommendation,
-            risk_image_path=risk_image_path,
-            inputbar_image_path=inputbar_image_path
-        )
-
-        with open(report_path, "rb") as f:
-            st.download_button("📄 Download Detailed Medical Report (PDF)", f,
-                               file_name=os.path.basename(report_path),
-                               mime="application/pdf")
-
-        # Clean up temporary images after download button is rendered
-        def cleanup_files(*filepaths):
-            import time
-            import threading
-            def delayed_remove(paths):
-                import os
-                import time
-                time.sleep(10)  # wait a bit before deleting so file is ready
-                for p in paths:
-                    try:
-                        os.remove(p)
-                    except Exception:
-                        pass
-            thread = threading.Thread(target=delayed_remove, args=(filepaths,))
-            thread.start()
-        cleanup_files(risk_image_path, inputbar_image_path)
+            st.warning(f"📄 {last['report_error']}")
 
 if __name__ == "__main__":
     main()
@@ -1,11 +1,44 @@
 import streamlit as st
-import google.generativeai as genai
 from dotenv import load_dotenv
-import os
+import time
+import metrics
+from auth_utils import end_session, session_is_valid
+from chat_backend import StreamedReply
+from chat_context import ChatContext, model_summarizer, page_of
+from chat_cache import response_cache_from_env
+from gemini_client import ChatUnavailable, get_gemini_client
 
 # Load environment variables
 load_dotenv()
-api_key = os.getenv("GEMINI_API_KEY")
+
+MODEL_NAME = 'gemini-2.0-flash'
+
+# System prompt (set once on the model, not repeated in every message)
+system_prompt = (
+    "You are a highly professional medical assistant AI helping doctors. "
+    "Provide accurate, concise, and evidence-based medical advice. "
+    "If unsure, recommend consulting a specialist."
+)
+
+# Rendered history is paginated and capped; older turns live on in the context summary
+MESSAGES_PER_PAGE = 20
+MAX_DISPLAYED_MESSAGES = 200
+
+
+# Answers cached on disk, shared by all sessions and kept across restarts
+@st.cache_resource
+def get_response_cache():
+    return response_cache_from_env()
+
+
+# One client per process: configured once and shared by every session, so the
+# concurrency and rate limits apply to all doctors together. The Gemini SDK is
+# only imported when the first question is asked (CHAT_BACKEND=fake uses the
+# offline stand-in).
+@st.cache_resource
+def get_chat_client():
+    return get_gemini_client(MODEL_NAME)
+
 
 # ✅ Initialize session state keys safely
 if "authenticated" not in st.session_state:
@@ -16,73 +49,115 @@ if "doctor_id" not in st.session_state:
     st.session_state.doctor_id = None
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
+if "chat_context" not in st.session_state:
+    st.session_state.chat_context = ChatContext()
 
 # Sidebar: Logout and login status
 with st.sidebar:
     st.title("Sumit HealthCare 🏥")
     st.markdown("---")
 
-    if st.session_state.authenticated:
+    if session_is_valid(st.session_state):
         st.success(f"Logged in as **{st.session_state.email}**")
         if st.button("🚪 Logout"):
-            st.session_state.authenticated = False
-            st.session_state.email = None
-            st.session_state.doctor_id = None
+            end_session(st.session_state)
             st.success("You have been logged out.")
             st.rerun()
+        metrics.admin_panel(st.session_state.email)
     else:
         st.info("🔐 Please log in to access the app features.")
 
+metrics.serve_from_env()
+
 # ✅ Stop access if not authenticated
-if not st.session_state.authenticated:
+if not session_is_valid(st.session_state):
     st.warning("🔐 Please log in to access the chatbot.")
     st.stop()
 
-# Configure API key
-genai.configure(api_key=api_key)
-
 st.title("🩺 Doctor's Assistant Chatbot")
 
-# Display past messages
-for msg in st.session_state.chat_history:
-    role = "🧑‍⚕️ You" if msg["role"] == "user" else "🤖 AI Assistant"
-    st.chat_message(role).markdown(msg["content"])
 
-# Input from user
-user_input = st.chat_input("Ask your medical question here...")
+def show_messages(messages):
+    for msg in messages:
+        role = "🧑‍⚕️ You" if msg["role"] == "user" else "🤖 AI Assistant"
+        st.chat_message(role).markdown(msg["content"])
 
-# System prompt
-system_prompt = (
-    "You are a highly professional medical assistant AI helping doctors. "
-    "Provide accurate, concise, and evidence-based medical advice. "
-    "If unsure, recommend consulting a specialist."
-)
 
-# Initialize Gemini model
-model = genai.GenerativeModel('gemini-2.0-flash')
+# Display past messages: only the latest page is rendered on every rerun
+history = st.session_state.chat_history
+latest, pages = page_of(history, MESSAGES_PER_PAGE)
+if pages > 1:
+    with st.expander(f"🕘 Earlier messages ({len(history) - len(latest)})"):
+        page = st.number_input("Page", min_value=1, max_value=pages - 1, value=pages - 1)
+        show_messages(page_of(history, MESSAGES_PER_PAGE, page)[0])
+show_messages(latest)
 
-# Generate and display response
+# Input from user
+user_input = st.chat_input("Ask your medical question here...")
+
+# Generate and display the response as it streams in (no extra rerun afterwards)
 if user_input:
     st.session_state.chat_history.append({"role": "user", "content": user_input})
-
-    try:
-        if "chat_session" not in st.session_state:
-            st.session_state.chat_session = model.start_chat(history=[])
-
-        response = st.session_state.chat_session.send_message(
-            f"{system_prompt}\n\n{user_input}"
-        )
-        reply = response.text.strip()
-    except Exception as e:
-        reply = f"⚠️ Error generating response: {e}"
-
-    st.session_state.chat_history.append({"role": "assistant", "content": reply})
-    st.rerun()
+    st.chat_message("🧑‍⚕️ You").markdown(user_input)
+
+    with st.chat_message("🤖 AI Assistant"):
+        stream = None
+        reply = None
+        error = None
+        context = st.session_state.chat_context
+        # Only first-turn questions are cached: a follow-up ("what dose for her?") depends on
+        # this conversation, so an answer cached from another consult would be wrong
+        response_cache = get_response_cache() if not (context.messages or context.summary) else None
+        try:
+            cached = None
+            if response_cache is not None:
+                with metrics.span("chat.cache_lookup"):
+                    cached = response_cache.get(user_input, system_prompt, MODEL_NAME)
+            if cached is not None:
+                reply = cached
+                st.markdown(reply)
+                st.caption("⚡ Answered from cache")
+            else:
+                # A fresh chat over the bounded context: summary + recent messages only
+                started = time.perf_counter()
+                response = get_chat_client().stream_chat(context.model_history(), user_input, system_instruction=system_prompt)
+                stream = StreamedReply(response, started=started)
+                reply = st.write_stream(stream).strip()
+                if response_cache is not None and reply:
+                    response_cache.put(user_input, system_prompt, MODEL_NAME, reply)
+        except ChatUnavailable as e:
+            error = f"⏳ {e}"
+            st.markdown(error)
+        except Exception:
+            error = "⚠️ The assistant could not answer right now. Please try again in a moment."
+            st.markdown(error)
+
+        if stream is not None and stream.ttft_ms is not None:
+            metrics.observe("chat.first_token", stream.ttft_ms / 1000)
+            if stream.total_ms is not None:
+                metrics.observe("chat.reply", stream.total_ms / 1000)
+            ttfts = st.session_state.setdefault("chat_ttft_ms", [])
+            ttfts.append(stream.ttft_ms)
+            del ttfts[:-100]
+            st.caption(f"First token in {stream.ttft_ms:.0f} ms · full reply in {stream.total_ms:.0f} ms")
+
+    if error is None:
+        context.add("user", user_input)
+        context.add("assistant", reply)
+        # Fold older turns into the rolling summary once over the token budget
+        with metrics.span("chat.summarize"):
+            context.compact(model_summarizer(get_chat_client()))
+    st.session_state.chat_history.append({"role": "assistant", "content": error or reply})
+    del st.session_state.chat_history[:-MAX_DISPLAYED_MESSAGES]
 
 # Clear chat button
 st.markdown("---")
+response_cache = get_response_cache()
+if response_cache is not None:
+    cache_stats = response_cache.stats()
+    st.caption(f"Response cache: {cache_stats['entries']} answers stored · "
+               f"{cache_stats['hit_rate']:.0%} hit rate ({cache_stats['hits']} hits, {cache_stats['misses']} misses)")
 if st.button("🗑️ Clear Chat"):
     st.session_state.chat_history = []
-    if "chat_session" in st.session_state:
-        del st.session_state.chat_session
+    st.session_state.chat_context = ChatContext()
     st.rerun()
@@ -0,0 +1,48 @@
+import collections
+import threading
+
+
+class LRUCache:
+    """Thread-safe mapping bounded to ``max_entries``; the least recently used entry goes first."""
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._entries.get(key, default)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def prediction_key(disease, values, model_version=None):
+    # Floats as entered: identical submissions hit, any edited input misses. The model
+    # version (its artifact hash) keeps results of a hot-reloaded model's predecessor out
+    return (disease, model_version) + tuple(float(v) for v in values)
+
+
+def report_key(disease, values, **patient):
+    """The prediction key plus the patient/doctor fields printed on the PDF."""
+    return prediction_key(disease, values) + tuple(sorted(patient.items()))
@@ -0,0 +1,344 @@
+"""Headless prediction HTTP service (standard library asyncio + NumPy only).
+
+Usage:
+    python prediction_service.py --port 8000 --max-batch 64 --max-wait-ms 2
+
+Endpoints:
+    GET  /health   liveness check
+    GET  /schema   input fields per disease (same as the Predictor page)
+    GET  /stats    request counts, batch sizes, latency percentiles and, with
+                   MODEL_SHADOW=1, how often shadow models disagree with live ones
+    GET  /metrics  per-stage latency histograms in Prometheus text format
+    GET  /reports/<signed link>
+                   stored PDF report, streamed in chunks (only with --serve-reports;
+                   links come from the Predictor page and need a shared AUTH_SECRET_KEY)
+    POST /predict  {"disease": "Diabetes", "inputs": {"Glucose Level": 148, ...}}
+                   "inputs" may also be a list of values in schema order.
+
+Concurrent single-patient requests for the same disease are coalesced into
+one batch for up to --max-wait-ms before they are scored together. New model
+versions in models/ are picked up every MODEL_RELOAD_SECONDS without a restart.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import re
+import time
+
+import numpy as np
+
+import metrics
+from auth_utils import has_shared_secret, verify_report_link
+from disease_config import disease_inputs
+from model_registry import ModelRegistry, registry_from_env
+from report_store import ReportNotFound, report_store_from_env
+
+MAX_BODY_BYTES = 1024 * 1024
+MAX_HEADER_LINES = 100  # each line is also capped by the stream limit (64 KiB)
+
+
+class BadRequest(Exception):
+    pass
+
+
+class LatencyStats:
+    def __init__(self, window=10000):
+        self.latencies = collections.deque(maxlen=window)
+        self.batch_sizes = collections.deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+
+    def record(self, seconds):
+        self.requests += 1
+        self.latencies.append(seconds)
+
+    def snapshot(self):
+        result = {"requests": self.requests, "errors": self.errors}
+        if self.latencies:
+            p50, p95, p99 = np.percentile(np.fromiter(self.latencies, dtype=np.float64), [50, 95, 99])
+            result["latency_ms"] = {"p50": round(p50 * 1000, 3), "p95": round(p95 * 1000, 3),
+                                    "p99": round(p99 * 1000, 3)}
+        if self.batch_sizes:
+            result["batches"] = len(self.batch_sizes)
+            result["mean_batch_size"] = round(float(np.mean(self.batch_sizes)), 2)
+            result["max_batch_size"] = int(max(self.batch_sizes))
+        return result
+
+
+class MicroBatcher:
+    """Collects single-patient requests per disease and scores them as one matrix."""
+
+    def __init__(self, registry, stats, max_batch=64, max_wait=0.002):
+        self.registry = registry
+        self.stats = stats
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queues = {}
+        self.workers = []
+
+    def start(self):
+        for disease in disease_inputs:
+            self.registry.get(disease)  # load models before taking traffic
+            self.queues[disease] = asyncio.Queue()
+            self.workers.append(asyncio.create_task(self._worker(disease)))
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+
+    async def submit(self, disease, row):
+        future = asyncio.get_running_loop().create_future()
+        await self.queues[disease].put((row, future))
+        return await future
+
+    async def _worker(self, disease):
+        queue = self.queues[disease]
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self.stats.batch_sizes.append(len(batch))
+            try:
+                with metrics.span("service.score_batch"):
+                    labels, risks = self.registry.score(disease, np.array([row for row, _ in batch]))
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), label, risk in zip(batch, labels, risks):
+                if not future.done():
+                    future.set_result((int(label), float(risk)))
+
+
+def parse_inputs(disease, inputs):
+    fields = disease_inputs[disease]
+    if isinstance(inputs, dict):
+        missing = [field for field in fields if field not in inputs]
+        if missing:
+            raise BadRequest(f"Missing inputs: {', '.join(missing)}")
+        values = [inputs[field] for field in fields]
+    elif isinstance(inputs, list):
+        if len(inputs) != len(fields):
+            raise BadRequest(f"Expected {len(fields)} values, got {len(inputs)}")
+        values = inputs
+    else:
+        raise BadRequest("'inputs' must be an object or a list")
+    try:
+        row = [float(v) for v in values]
+    except (TypeError, ValueError):
+        raise BadRequest("All inputs must be numbers")
+    if not all(np.isfinite(row)):
+        raise BadRequest("All inputs must be finite numbers")
+    return row
+
+
+class FileResponse:
+    def __init__(self, chunks, size, file_name, content_type="application/pdf"):
+        self.chunks = chunks
+        self.size = size
+        self.file_name = file_name
+        self.content_type = content_type
+
+
+class PredictionService:
+    def __init__(self, registry=None, max_batch=64, max_wait=0.002, report_store=None):
+        self.stats = LatencyStats()
+        self.batcher = MicroBatcher(registry or ModelRegistry(), self.stats, max_batch, max_wait)
+        self.report_store = report_store
+
+    async def report(self, token):
+        report_id = verify_report_link(token)
+        if report_id is None:
+            return 404, {"error": "Invalid or expired report link"}
+        try:
+            info = await asyncio.to_thread(self.report_store.info, report_id)
+        except ReportNotFound:
+            return 404, {"error": "Report not found"}
+        return 200, FileResponse(self.report_store.iter_chunks(report_id), info["size"], info["file_name"])
+
+    async def predict(self, payload):
+        if not isinstance(payload, dict):
+            raise BadRequest("Request body must be a JSON object")
+        disease = payload.get("disease")
+        if disease not in disease_inputs:
+            raise BadRequest(f"Unknown disease: {disease}")
+        row = parse_inputs(disease, payload.get("inputs"))
+        label, risk = await self.batcher.submit(disease, row)
+        return {
+            "disease": disease,
+            "prediction": label,
+            "result": "Positive (At Risk)" if label == 1 else "Negative (Not At Risk)",
+            "risk_percent": round(risk, 4),
+        }
+
+    async def route(self, method, path, body):
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok"}
+        if method == "GET" and path == "/schema":
+            return 200, disease_inputs
+        if method == "GET" and path == "/stats":
+            snapshot = self.stats.snapshot()
+            shadow = self.batcher.registry.shadow_stats()
+            if shadow:
+                snapshot["shadow_models"] = shadow
+            return 200, snapshot
+        if method == "GET" and path == "/metrics":
+            return 200, metrics.registry.render_prometheus()
+        if method == "GET" and path.startswith("/reports/") and self.report_store is not None:
+            return await self.report(path[len("/reports/"):])
+        if method == "POST" and path == "/predict":
+            started = time.perf_counter()
+            try:
+                payload = json.loads(body or b"null")
+            except ValueError:
+                raise BadRequest("Invalid JSON body")
+            result = await self.predict(payload)
+            self.stats.record(time.perf_counter() - started)
+            return 200, result
+        return 404, {"error": f"Not found: {method} {path}"}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                except ValueError:  # longer than the stream limit
+                    await self._respond(writer, 414, {"error": "Request line too long"}, False)
+                    break
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "Malformed request line"}, False)
+                    break
+
+                headers = {}
+                try:
+                    for _ in range(MAX_HEADER_LINES + 1):
+                        line = await reader.readline()
+                        if line in (b"\r\n", b"\n", b""):
+                            break
+                        name, _, value = line.decode("latin-1").partition(":")
+                        headers[name.strip().lower()] = value.strip()
+                    else:
+                        raise ValueError("too many header lines")
+                except ValueError:  # a line longer than the stream limit, or too many lines
+                    await self._respond(writer, 431, {"error": "Request header fields too large"}, False)
+                    break
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                content_length = headers.get("content-length") or "0"
+                if not (content_length.isascii() and content_length.isdigit()):
+                    await self._respond(writer, 400, {"error": "Malformed Content-Length header"}, False)
+                    break
+                length = int(content_length)
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {"error": "Request body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                try:
+                    status, result = await self.route(method, target.split("?", 1)[0], body)
+                except BadRequest as e:
+                    self.stats.errors += 1
+                    status, result = 400, {"error": str(e)}
+                except Exception as e:
+                    self.stats.errors += 1
+                    status, result = 500, {"error": f"Prediction failed: {e}"}
+                await self._respond(writer, status, result, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+                   414: "URI Too Long", 431: "Request Header Fields Too Large",
+                   500: "Internal Server Error"}
+        if isinstance(payload, FileResponse):
+            await self._stream_file(writer, payload, keep_alive)
+            return
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), metrics.PROMETHEUS_CONTENT_TYPE
+        else:
+            body, content_type = json.dumps(payload).encode("utf-8"), "application/json"
+        head = (f"HTTP/1.1 {status} {reasons.get(status, 'OK')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def _stream_file(self, writer, file, keep_alive):
+        # One chunk in memory at a time; store reads run on a thread so the loop keeps serving
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]', "_", file.file_name)
+        head = (f"HTTP/1.1 200 OK\r\n"
+                f"Content-Type: {file.content_type}\r\n"
+                f"Content-Length: {file.size}\r\n"
+                f"Content-Disposition: attachment; filename=\"{safe_name}\"\r\n"
+                f"Cache-Control: private, no-store\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1"))
+        while True:
+            chunk = await asyncio.to_thread(next, file.chunks, None)
+            if chunk is None:
+                break
+            writer.write(chunk)
+            await writer.drain()
+
+    async def serve(self, host, port):
+        self.batcher.start()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Prediction service listening on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless disease prediction HTTP service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch", type=int, default=64, help="largest coalesced batch")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0,
+                        help="how long to wait for more requests before scoring a batch")
+    parser.add_argument("--serve-reports", action="store_true",
+                        help="serve signed report links from the configured report store (REPORT_STORE)")
+    args = parser.parse_args(argv)
+
+    report_store = None
+    if args.serve_reports:
+        if not has_shared_secret():
+            # With a per-process key, no link signed by the app could ever verify here
+            parser.error("--serve-reports needs AUTH_SECRET_KEY, set to the same value as for the app")
+        report_store = report_store_from_env()
+        if report_store is None:
+            parser.error("--serve-reports needs REPORT_STORE=gridfs or REPORT_STORE_DIR")
+    service = PredictionService(registry_from_env(), max_batch=args.max_batch,
+                                max_wait=args.max_wait_ms / 1000,
+                                report_store=report_store)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import math
+import threading
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.patches import Wedge
+from PIL import Image
+
+# Same bands as the interactive Plotly gauge on the Predictor page
+GAUGE_STEPS = [(0, 40, "lightgreen"), (40, 70, "yellow"), (70, 100, "red")]
+
+
+def _angle(value):
+    # 0% sits at the left end of the half circle, 100% at the right end
+    return 180.0 - 1.8 * max(0.0, min(100.0, value))
+
+
+def render_gauge(risk_percent, disease, output, dpi=150):
+    """Draw the risk gauge for the PDF report in-process with matplotlib's Agg backend.
+
+    ``output`` can be a file path or a binary file-like object; the PNG is written there.
+    """
+    fig = Figure(figsize=(6, 3.1), dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_axes([0, 0, 1, 0.88])
+    ax.set_xlim(-1.2, 1.2)
+    ax.set_ylim(-0.1, 1.15)
+    ax.set_aspect("equal")
+    ax.axis("off")
+
+    for start, end, color in GAUGE_STEPS:
+        ax.add_patch(Wedge((0, 0), 1.0, _angle(end), _angle(start), width=0.35, color=color))
+    ax.add_patch(Wedge((0, 0), 0.9, _angle(risk_percent), 180.0, width=0.15, color="crimson"))
+
+    # Threshold marker at the predicted value
+    theta = math.radians(_angle(risk_percent))
+    ax.plot([0.62 * math.cos(theta), 1.02 * math.cos(theta)],
+            [0.62 * math.sin(theta), 1.02 * math.sin(theta)], color="black", linewidth=3)
+
+    for tick in range(0, 101, 20):
+        theta = math.radians(_angle(tick))
+        ax.text(1.1 * math.cos(theta), 1.1 * math.sin(theta), str(tick),
+                ha="center", va="center", fontsize=9)
+
+    ax.text(0, 0.05, f"{risk_percent:.1f}", ha="center", va="bottom", fontsize=28)
+    fig.suptitle(f"{disease} Risk Probability (%)", fontsize=13)
+
+    # Fast zlib level: the PNG is embedded once in the PDF, size barely matters
+    fig.savefig(output, format="png", dpi=dpi, pil_kwargs={"compress_level": 1})
+    if hasattr(output, "seek"):
+        output.seek(0)
+    return output
+
+
+class BarChart:
+    """A horizontal bar chart laid out once and then redrawn with new bars.
+
+    The figure is built and laid out when the chart is created, and the parts
+    that never change (title, axis label, frame and, unless ``relabel`` is set,
+    the bar labels) are rendered once into a background. ``render`` restores
+    that background, redraws the bars, the rescaled x axis and the changing
+    parts, and encodes the canvas as PNG, so no figure is created per chart.
+    Renders of the same chart take turns on its lock.
+
+    ``labels`` are the bar labels, or with ``relabel`` every label a render may
+    use (the layout leaves room for the widest). ``zero_line`` draws a line at 0.
+    """
+
+    # Placeholder bar length for the one-off layout: wide enough x tick labels for typical inputs
+    LAYOUT_VALUE = 1000.0
+
+    def __init__(self, labels, bars, title, xlabel, height, dpi=100, color="skyblue", relabel=False,
+                 zero_line=False):
+        self.dpi = dpi
+        self._lock = threading.Lock()
+        self._figure = Figure(figsize=(8, height), dpi=dpi)
+        self._canvas = FigureCanvasAgg(self._figure)
+        self._ax = self._figure.add_subplot()
+        positions = list(range(bars))
+        self._bars = self._ax.barh(positions, [self.LAYOUT_VALUE] * bars, color=color)
+        self._zero_line = self._ax.axvline(0, color="black", linewidth=0.8) if zero_line else None
+        self._ax.set_xlabel(xlabel)
+        self._ax.set_title(title)
+        if relabel:
+            # All candidates stacked over the bars: the layout makes room for the widest one
+            self._ax.set_yticks([i * (bars - 1) / max(1, len(labels) - 1) for i in range(len(labels))], labels)
+        else:
+            self._ax.set_yticks(positions, labels)
+        self._figure.tight_layout()
+        if relabel:
+            self._ax.set_yticks(positions, labels[:bars])
+
+        # Animated artists are left out of a full draw; render draws them over the background
+        self._animated = list(self._bars) + [self._ax.xaxis]
+        if relabel:
+            self._animated.append(self._ax.yaxis)
+        if zero_line:
+            self._animated.append(self._zero_line)
+        for artist in self._animated:
+            artist.set_animated(True)
+        self._canvas.draw()
+        self._background = self._canvas.copy_from_bbox(self._figure.bbox)
+
+    def render(self, values, output, labels=None, colors=None):
+        """Write the chart for ``values`` (bottom bar first) to ``output`` as PNG.
+
+        ``labels`` replace the bar labels (``relabel`` charts), ``colors`` the bar colors.
+        """
+        with self._lock:
+            for bar, value in zip(self._bars, values):
+                bar.set_width(float(value))
+            if colors is not None:
+                for bar, color in zip(self._bars, colors):
+                    bar.set_color(color)
+            if labels is not None:
+                self._ax.set_yticklabels(labels)
+            self._ax.relim()
+            self._ax.autoscale_view(scaley=False)  # the bar positions never change
+            self._canvas.restore_region(self._background)
+            for artist in self._animated:
+                self._ax.draw_artist(artist)
+            pixels = np.array(self._canvas.buffer_rgba())
+        # Encoded outside the lock; fast zlib level as for the other charts
+        Image.fromarray(pixels).save(output, format="png", dpi=(self.dpi, self.dpi), compress_level=1)
+        if hasattr(output, "seek"):
+            output.seek(0)
+        return output
+
+
+_charts = {}
+_charts_lock = threading.Lock()
+
+
+def _chart(key, create):
+    chart = _charts.get(key)
+    if chart is None:
+        with _charts_lock:
+            chart = _charts.get(key)
+            if chart is None:
+                chart = _charts[key] = create()
+    return chart
+
+
+def input_bars_chart(disease, fields, dpi=100):
+    """The process-wide input bar chart for ``disease`` with these ``fields``, created on first use."""
+    fields = tuple(fields)
+    return _chart(("inputs", disease, fields, dpi), lambda: BarChart(
+        fields, len(fields), f"Input Parameters for {disease} Prediction", "Values",
+        max(4, len(fields) * 0.3), dpi))
+
+
+def contributions_chart(disease, fields, top=8, dpi=100):
+    """The process-wide chart of the ``top`` contributions among ``fields``, created on first use."""
+    fields = tuple(fields)
+    bars = min(top, len(fields))
+    return _chart(("contributions", disease, fields, bars, dpi), lambda: BarChart(
+        fields, bars, f"Top Factors in this {disease} Prediction",
+        "Contribution to the risk score (coefficient × value)", max(2.5, 0.45 * bars + 1.2), dpi,
+        relabel=True, zero_line=True))
+
+
+def render_input_bars(inputs, disease, output, dpi=100):
+    """Draw the inputs (``{field: value}``) as horizontal bars with the disease's pre-built chart.
+
+    ``output`` can be a file path or a binary file-like object; the PNG is written there.
+    """
+    return input_bars_chart(disease, inputs.keys(), dpi).render(inputs.values(), output)
+
+
+def render_contributions(contributions, disease, output, top=8, dpi=100):
+    """Draw the ``top`` largest per-feature contributions (``{field: value}``) as horizontal bars.
+
+    Red bars pushed the prediction towards "at risk", green bars away from it.
+    ``output`` can be a file path or a binary file-like object; the PNG is written there.
+    """
+    items = sorted(contributions.items(), key=lambda item: abs(item[1]), reverse=True)[:top]
+    items.reverse()  # largest at the top of the chart
+    values = [value for _, value in items]
+    return contributions_chart(disease, contributions.keys(), top, dpi).render(
+        values, output, labels=[field for field, _ in items],
+        colors=["crimson" if value > 0 else "seagreen" for value in values])
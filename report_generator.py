@@ -0,0 +1,120 @@
+import io
+from datetime import datetime
+
+from fpdf import FPDF
+
+import metrics
+from disease_config import detailed_recommendations
+from report_charts import render_contributions, render_gauge, render_input_bars
+
+
+def report_file_name(patient_name):
+    safe_patient_name = patient_name.replace(" ", "_") if patient_name else "UnknownPatient"
+    return f"{safe_patient_name}Medical_Report{datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
+
+
+def generate_pdf_report(patient_name, age, sex, doctor_email, doctor_id, org_id, disease, input_data, prediction, recommendation,
+                        risk_image=None, inputbar_image=None, contributions_image=None):
+    # Images are in-memory PNG buffers; the PDF is returned as bytes (nothing touches the disk)
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Helvetica", 'B', 18)
+    pdf.cell(0, 12, "Sumit HealthCare Services", new_x="LMARGIN", new_y="NEXT", align='C')
+    pdf.set_font("Helvetica", '', 12)
+    pdf.cell(0, 8, "456 Wellness Ave, MedCity, Australia | +61-987-654-321", new_x="LMARGIN", new_y="NEXT", align='C')
+    pdf.cell(0, 8, f"Report Generated: {datetime.now().strftime('%d-%m-%Y %H:%M')}", new_x="LMARGIN", new_y="NEXT", align='C')
+    pdf.ln(12)
+
+    pdf.set_font("Helvetica", 'B', 14)
+    pdf.cell(0, 10, "Patient & Doctor Information", new_x="LMARGIN", new_y="NEXT")
+    pdf.set_font("Helvetica", '', 12)
+    pdf.cell(0, 8, f"Patient Name: {patient_name}", new_x="LMARGIN", new_y="NEXT")
+    pdf.cell(0, 8, f"Age: {age}   Sex: {sex}", new_x="LMARGIN", new_y="NEXT")
+    pdf.cell(0, 8, f"Doctor Email: {doctor_email}", new_x="LMARGIN", new_y="NEXT")
+    pdf.cell(0, 8, f"Doctor ID: {doctor_id}", new_x="LMARGIN", new_y="NEXT")
+    pdf.cell(0, 8, f"Organization ID: {org_id}", new_x="LMARGIN", new_y="NEXT")
+    pdf.ln(8)
+
+    pdf.set_font("Helvetica", 'B', 14)
+    pdf.cell(0, 10, f"Disease Predicted: {disease}", new_x="LMARGIN", new_y="NEXT")
+    pdf.set_font("Helvetica", '', 12)
+    result_text = "Positive (At Risk)" if prediction == 1 else "Negative (Not At Risk)"
+    pdf.cell(0, 8, f"Prediction Result: {result_text}", new_x="LMARGIN", new_y="NEXT")
+    pdf.ln(8)
+
+    # Add Risk Gauge Image if available
+    if risk_image is not None:
+        pdf.set_font("Helvetica", 'B', 14)
+        pdf.cell(0, 10, "Risk Probability Gauge:", new_x="LMARGIN", new_y="NEXT")
+        pdf.image(risk_image, w=160)
+        pdf.ln(10)
+
+    if contributions_image is not None:
+        pdf.set_font("Helvetica", 'B', 14)
+        pdf.cell(0, 10, "Main Factors in this Prediction:", new_x="LMARGIN", new_y="NEXT")
+        pdf.image(contributions_image, w=160)
+        pdf.set_font("Helvetica", 'I', 9)
+        pdf.multi_cell(0, 5, "Red bars raised the predicted risk and green bars lowered it "
+                             "(model coefficient x entered value).")
+        pdf.ln(8)
+
+    pdf.set_font("Helvetica", 'B', 14)
+    pdf.cell(0, 10, "Input Parameters:", new_x="LMARGIN", new_y="NEXT")
+
+    # Add Input Bar Chart Image if available
+    if inputbar_image is not None:
+        pdf.image(inputbar_image, w=160)
+        pdf.ln(10)
+    else:
+        pdf.set_font("Helvetica", '', 11)
+        for key, value in input_data.items():
+            pdf.cell(0, 7, f"{key}: {value}", new_x="LMARGIN", new_y="NEXT")
+        pdf.ln(8)
+
+    pdf.set_font("Helvetica", 'B', 14)
+    pdf.cell(0, 10, "Medical Recommendation:", new_x="LMARGIN", new_y="NEXT")
+    pdf.set_font("Helvetica", '', 12)
+    pdf.multi_cell(0, 8, recommendation)
+    pdf.ln(12)
+
+    pdf.set_font("Helvetica", 'I', 9)
+    pdf.set_text_color(100, 100, 100)
+    pdf.multi_cell(0, 6, "This is an AI-generated report. Please consult a qualified medical professional for diagnosis and treatment.", align='C')
+
+    return bytes(pdf.output())
+
+
+def build_report(patient_name, age, sex, doctor_email, doctor_id, org_id, disease, input_data, prediction,
+                 risk_percent=None, contributions=None):
+    """Render the charts and the PDF for one prediction. Returns ``(file_name, pdf_bytes)``.
+
+    ``contributions`` maps each input to its contribution to the risk score
+    (``ModelRegistry.explain``); when given, the report charts the top factors.
+    """
+    risk_image = None
+    if risk_percent is not None:
+        with metrics.span("report.gauge"):
+            risk_image = render_gauge(risk_percent, disease, io.BytesIO())
+    contributions_image = None
+    if contributions:
+        with metrics.span("report.contributions"):
+            contributions_image = render_contributions(contributions, disease, io.BytesIO())
+    with metrics.span("report.bar_chart"):
+        inputbar_image = render_input_bars(input_data, disease, io.BytesIO())
+    with metrics.span("report.pdf"):
+        report_bytes = generate_pdf_report(
+            patient_name=patient_name,
+            age=age,
+            sex=sex,
+            doctor_email=doctor_email,
+            doctor_id=doctor_id,
+            org_id=org_id,
+            disease=disease,
+            input_data=input_data,
+            prediction=prediction,
+            recommendation=detailed_recommendations[disease][prediction],
+            risk_image=risk_image,
+            inputbar_image=inputbar_image,
+            contributions_image=contributions_image
+        )
+    return report_file_name(patient_name), report_bytes
@@ -0,0 +1,151 @@
+import collections
+import contextlib
+import multiprocessing
+import sys
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import metrics
+
+
+class ReportQueueFull(Exception):
+    pass
+
+
+def _warm_up_worker():
+    # Pay the matplotlib font cache / fpdf import cost and lay out the bar charts once per worker,
+    # not per report
+    import report_charts
+    import report_generator
+    from disease_config import disease_inputs
+
+    for disease, fields in disease_inputs.items():
+        report_charts.input_bars_chart(disease, fields)
+        report_charts.contributions_chart(disease, fields)
+    report_generator.build_report("Warm Up", 1, "Other", "", "", "", "Diabetes",
+                                  dict.fromkeys(disease_inputs["Diabetes"], 1.0), 0, 50.0,
+                                  contributions={"Age": 0.1})
+
+
+@contextlib.contextmanager
+def _as_main_module():
+    # Streamlit installs the running page as __main__, and "spawn" re-runs __main__ in each new
+    # worker: the whole page (sidebar, metrics server, ...) would execute there as well
+    main = sys.modules["__main__"]
+    sys.modules["__main__"] = sys.modules[__name__]
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main
+
+
+_report_store = None
+
+
+def _run_report(kwargs):
+    global _report_store
+    import report_generator
+    from report_store import report_store_from_env
+
+    # Stage timings are sent back with the result; the worker's own histograms are never scraped
+    with metrics.registry.recording() as timings, metrics.span("report.total"):
+        report_name, report_bytes = report_generator.build_report(**kwargs)
+
+        # With a report store (REPORT_STORE / REPORT_STORE_DIR) only the id travels back;
+        # the page, on whichever replica, reads the PDF from the store
+        if _report_store is None:
+            _report_store = report_store_from_env() or False
+        report_id = None
+        if _report_store:
+            with metrics.span("report.store"):
+                report_id = _report_store.save(report_name, report_bytes, doctor_id=kwargs.get("doctor_id"),
+                                               disease=kwargs.get("disease"))
+            report_bytes = None
+    return {"file_name": report_name, "data": report_bytes, "report_id": report_id, "timings": timings}
+
+
+class ReportWorkerPool:
+    """Generates PDF reports on a bounded pool of reusable worker processes.
+
+    ``submit`` returns a job id immediately; pages poll ``status``/``result``.
+    At most ``max_pending`` jobs may be queued or running at once, and the
+    results of the last ``keep_finished`` jobs are kept for download.
+    """
+
+    def __init__(self, max_workers=2, max_pending=32, keep_finished=200):
+        self.max_workers = max_workers
+        self._executor = self._new_executor()
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self._jobs = collections.OrderedDict()
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _new_executor(self):
+        # "spawn" avoids forking the multi-threaded Streamlit server process
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_up_worker,
+        )
+
+    def submit(self, **report_kwargs):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise ReportQueueFull("Report queue is full, please try again in a moment.")
+            self._pending += 1
+            job_id = uuid.uuid4().hex
+            try:
+                with _as_main_module():  # workers are started on submit
+                    try:
+                        future = self._executor.submit(_run_report, report_kwargs)
+                    except BrokenProcessPool:
+                        # A worker died (e.g. killed for memory); start a fresh pool
+                        self._executor = self._new_executor()
+                        future = self._executor.submit(_run_report, report_kwargs)
+            except BaseException:
+                # Never submitted, so _job_done will not release the slot
+                self._pending -= 1
+                raise
+            self._jobs[job_id] = future
+            self._evict_finished()
+        future.add_done_callback(self._job_done)
+        return job_id
+
+    def _job_done(self, future):
+        with self._lock:
+            self._pending -= 1
+        if not future.cancelled() and future.exception() is None:
+            for stage, seconds in future.result()["timings"]:
+                metrics.observe(stage, seconds)
+
+    def _evict_finished(self):
+        finished = [job_id for job_id, future in self._jobs.items() if future.done()]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+    def status(self, job_id):
+        future = self._jobs.get(job_id)
+        if future is None:
+            return "unknown"
+        if not future.done():
+            return "running" if future.running() else "queued"
+        return "failed" if future.exception() is not None else "done"
+
+    def result(self, job_id):
+        """Return ``{"file_name", "data", "report_id"}`` for a finished job (re-raises a worker error).
+
+        ``data`` holds the PDF bytes, or None when the report was saved to the
+        report store under ``report_id``.
+        """
+        result = self._jobs[job_id].result(timeout=0)
+        return {k: result[k] for k in ("file_name", "data", "report_id")}
+
+    def error(self, job_id):
+        future = self._jobs.get(job_id)
+        return future.exception() if future is not None and future.done() else None
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
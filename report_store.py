@@ -0,0 +1,261 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+# Same as GridFS' default chunk size, so both backends stream in equal pieces
+CHUNK_SIZE = 255 * 1024
+
+
+class ReportNotFound(Exception):
+    pass
+
+
+def content_id(data):
+    """Reports are stored under the SHA-256 of their bytes: saving the same PDF twice keeps one copy,
+    and two different reports can never overwrite each other."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _check_id(report_id):
+    if not re.fullmatch(r"[0-9a-f]{64}", report_id or ""):
+        raise ReportNotFound(f"Invalid report id: {report_id!r}")
+
+
+class LocalReportStore:
+    """Generated PDF reports in a local directory (single node or a shared volume).
+
+    Files live at ``<directory>/<id[:2]>/<id>.pdf`` with a ``.json`` sidecar
+    holding the download name and metadata. ``sweep`` removes reports older
+    than ``max_age_days`` and, beyond ``max_reports``, the oldest ones.
+    """
+
+    def __init__(self, directory, max_reports=500, max_age_days=30):
+        self.directory = directory
+        self.max_reports = max_reports
+        self.max_age = max_age_days * 86400
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, report_id):
+        _check_id(report_id)
+        return os.path.join(self.directory, report_id[:2], report_id + ".pdf")
+
+    def save(self, file_name, data, **metadata):
+        """Store ``data`` and return its report id."""
+        report_id = content_id(data)
+        path = self._path(report_id)
+        if os.path.exists(path):
+            return report_id
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        info = {"file_name": file_name, "size": len(data), "created_at": time.time(), "metadata": metadata}
+        tmp_suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(path[:-4] + ".json" + tmp_suffix, "w") as f:
+            json.dump(info, f)
+        os.replace(path[:-4] + ".json" + tmp_suffix, path[:-4] + ".json")
+        # The PDF is renamed into place last: once it exists, the report is complete
+        with open(path + tmp_suffix, "wb") as f:
+            f.write(data)
+        os.replace(path + tmp_suffix, path)
+        return report_id
+
+    def info(self, report_id):
+        path = self._path(report_id)
+        try:
+            with open(path[:-4] + ".json") as f:
+                info = json.load(f)
+            size = os.path.getsize(path)
+        except OSError:
+            raise ReportNotFound(report_id) from None
+        return dict(info, report_id=report_id, size=size)
+
+    def open(self, report_id):
+        try:
+            return open(self._path(report_id), "rb")
+        except FileNotFoundError:
+            raise ReportNotFound(report_id) from None
+
+    def iter_chunks(self, report_id, chunk_size=CHUNK_SIZE):
+        with self.open(report_id) as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    def read(self, report_id):
+        return b"".join(self.iter_chunks(report_id))
+
+    def delete(self, report_id):
+        path = self._path(report_id)
+        for p in (path, path[:-4] + ".json"):
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+
+    def sweep(self):
+        """Apply the retention policy; returns the number of reports removed."""
+        with self._lock:
+            entries = []
+            for root, _, names in os.walk(self.directory):
+                for name in names:
+                    if name.endswith(".pdf"):
+                        path = os.path.join(root, name)
+                        try:
+                            entries.append((os.path.getmtime(path), path))
+                        except OSError:
+                            pass
+            entries.sort()
+
+            cutoff = time.time() - self.max_age
+            excess = len(entries) - self.max_reports
+            removed = 0
+            for i, (mtime, path) in enumerate(entries):
+                if i < excess or mtime < cutoff:
+                    for p in (path, path[:-4] + ".json"):
+                        try:
+                            os.remove(p)
+                        except OSError:
+                            pass
+                    removed += 1
+            return removed
+
+
+class GridFSReportStore:
+    """Generated PDF reports in MongoDB GridFS, readable from every app replica.
+
+    Uses the GridFS layout (``<bucket>.files`` and ``<bucket>.chunks``) directly
+    rather than the ``gridfs`` package, so it works both against a real mongod
+    and an in-memory stand-in such as mongomock; mongofiles and other GridFS
+    clients can still read the bucket. Each report's ``_id`` is its content
+    hash, so concurrent saves of the same PDF from several workers keep a
+    single copy. Downloads are read one chunk at a time.
+    """
+
+    def __init__(self, database, bucket_name="reports", max_reports=500, max_age_days=30):
+        from pymongo import ASCENDING
+
+        self.files = database[f"{bucket_name}.files"]
+        self.chunks = database[f"{bucket_name}.chunks"]
+        self.chunks.create_index([("files_id", ASCENDING), ("n", ASCENDING)], unique=True)
+        self.files.create_index([("filename", ASCENDING), ("uploadDate", ASCENDING)])
+        self.files.create_index([("uploadDate", ASCENDING)])
+        self.max_reports = max_reports
+        self.max_age = max_age_days * 86400
+
+    def save(self, file_name, data, **metadata):
+        from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+        report_id = content_id(data)
+        if self.files.find_one({"_id": report_id}, {"_id": 1}) is not None:
+            return report_id
+        chunks = [
+            {"files_id": report_id, "n": n, "data": data[start:start + CHUNK_SIZE]}
+            for n, start in enumerate(range(0, len(data), CHUNK_SIZE))
+        ]
+        try:
+            if chunks:
+                self.chunks.insert_many(chunks, ordered=False)
+        except BulkWriteError as e:
+            # Another worker is saving the same report; its chunks are identical
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+        # The files document goes in last: once it exists, the report is complete
+        try:
+            self.files.insert_one({
+                "_id": report_id,
+                "length": len(data),
+                "chunkSize": CHUNK_SIZE,
+                "uploadDate": datetime.now(timezone.utc),
+                "filename": file_name,
+                "metadata": metadata,
+            })
+        except DuplicateKeyError:
+            pass
+        return report_id
+
+    def info(self, report_id):
+        _check_id(report_id)
+        doc = self.files.find_one({"_id": report_id})
+        if doc is None:
+            raise ReportNotFound(report_id)
+        return {
+            "report_id": report_id,
+            "file_name": doc["filename"],
+            "size": doc["length"],
+            "created_at": doc["uploadDate"].replace(tzinfo=timezone.utc).timestamp(),
+            "metadata": doc.get("metadata") or {},
+        }
+
+    def iter_chunks(self, report_id, chunk_size=CHUNK_SIZE):
+        """Yield the stored chunks in order (``chunk_size`` is fixed at save time in GridFS)."""
+        self.info(report_id)
+        # batch_size=1: the cursor holds one chunk in memory at a time
+        for chunk in self.chunks.find({"files_id": report_id}, {"data": 1}).sort("n", 1).batch_size(1):
+            yield bytes(chunk["data"])
+
+    def read(self, report_id):
+        return b"".join(self.iter_chunks(report_id))
+
+    def delete(self, report_id):
+        _check_id(report_id)
+        self.files.delete_one({"_id": report_id})
+        self.chunks.delete_many({"files_id": report_id})
+
+    def sweep(self):
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.max_age)
+        expired = [doc["_id"] for doc in self.files.find({"uploadDate": {"$lt": cutoff}}, {"_id": 1})]
+        excess = self.files.count_documents({}) - len(expired) - self.max_reports
+        if excess > 0:
+            oldest = self.files.find({"uploadDate": {"$gte": cutoff}}, {"_id": 1}).sort("uploadDate", 1)
+            expired += [doc["_id"] for doc in oldest.limit(excess)]
+        # Deleting an already deleted report is a no-op, so replicas may sweep concurrently
+        for report_id in expired:
+            self.delete(report_id)
+        return len(expired)
+
+
+class RetentionSweeper:
+    """Calls ``store.sweep()`` every ``interval`` seconds on a daemon thread.
+
+    Safe to run on every replica: deleting an already deleted report is a no-op.
+    """
+
+    def __init__(self, store, interval=3600):
+        self.store = store
+        self.interval = interval
+        self.last_removed = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="report-sweeper", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.last_removed = self.store.sweep()
+            except Exception:
+                pass  # Database briefly unavailable; try again next interval
+
+    def stop(self):
+        self._stop.set()
+
+
+def report_store_from_env():
+    """Configured store, or None when reports are not persisted.
+
+    REPORT_STORE=gridfs keeps reports in MongoDB (works across replicas without
+    a shared disk); REPORT_STORE=local, or just setting REPORT_STORE_DIR, keeps
+    them in a directory.
+    """
+    backend = os.getenv("REPORT_STORE", "local" if os.getenv("REPORT_STORE_DIR") else "").lower()
+    retention = {
+        "max_reports": int(os.getenv("REPORT_STORE_MAX_REPORTS", "500")),
+        "max_age_days": float(os.getenv("REPORT_STORE_MAX_AGE_DAYS", "30")),
+    }
+    if backend == "gridfs":
+        from database import get_database
+        return GridFSReportStore(get_database(), os.getenv("REPORT_STORE_BUCKET", "reports"), **retention)
+    if backend == "local":
+        return LocalReportStore(os.getenv("REPORT_STORE_DIR", "reports"), **retention)
+    return None
@@ -0,0 +1,63 @@
+import numpy as np
+
+
+class LinearModel:
+    """Pure-NumPy scoring kernel for the exported linear classifiers (no scikit-learn needed)."""
+
+    def __init__(self, coef, intercept, classes, kind="linear", metadata=None):
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64).ravel()
+        self.intercept = float(intercept)
+        self.classes_ = np.asarray(classes)
+        self.kind = kind
+        self.metadata = metadata or {}
+        self.n_features_in_ = self.coef.shape[0]
+
+    @classmethod
+    def from_npz(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            metadata = {
+                key: data[key].item()
+                for key in ("source_sha256", "sklearn_version", "estimator")
+                if key in data.files
+            }
+            return cls(data["coef"], data["intercept"], data["classes"],
+                       kind=str(data["kind"]), metadata=metadata)
+
+    def _as_matrix(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got {X.shape[1]}")
+        return X
+
+    def decision_function(self, X):
+        return self._as_matrix(X) @ self.coef + self.intercept
+
+    def _outputs(self, z):
+        labels = self.classes_[(z > 0).astype(np.intp)]
+        proba = 0.5 * (1.0 + np.tanh(0.5 * z))  # overflow-free logistic sigmoid
+        return labels, proba
+
+    def score(self, X):
+        # One fused matrix-vector product gives both the label and the class-1 probability
+        return self._outputs(self.decision_function(X))
+
+    def explain(self, X):
+        """``score`` plus each feature's contribution ``coef * x`` to the decision value.
+
+        The contributions of a row sum to its decision value minus the intercept.
+        The decision value still comes from the matrix-vector product (a BLAS call
+        is faster than summing the contributions), so labels and probabilities are
+        identical to ``score``. Returns ``(labels, proba, contributions)``.
+        """
+        X = self._as_matrix(X)
+        labels, proba = self._outputs(X @ self.coef + self.intercept)
+        return labels, proba, X * self.coef
+
+    def predict(self, X):
+        return self.score(X)[0]
+
+    def predict_proba(self, X):
+        proba = self.score(X)[1]
+        return np.column_stack([1.0 - proba, proba])